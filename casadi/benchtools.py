@@ -0,0 +1,72 @@
+""" Helpers shared by the benchmarks
+
+  metadata   : machine, versions and the current commit, stored with results
+  peakMemory : peak memory increase of a callable, measured in a fork
+  save, load : results as JSON
+  compare    : rows of new results that regressed against old ones
+
+Results are dicts {'metadata': ..., 'results': rows}, with one row per
+measured value. The benchmarks in the subdirectories import this module
+with the casadi/ directory on the path:
+
+  PYTHONPATH=.. python integratortest.py
+"""
+
+import json
+import subprocess
+
+def commit():
+  try:
+    return subprocess.check_output(['git','rev-parse','HEAD']).strip()
+  except (OSError,subprocess.CalledProcessError):
+    return 'unknown'
+
+def metadata():
+  import platform, socket, datetime, multiprocessing
+  import numpy
+  import casadi
+  return {
+    'hostname': socket.gethostname(),
+    'platform': platform.platform(),
+    'processor': platform.processor(),
+    'cpus': multiprocessing.cpu_count(),
+    'python': platform.python_version(),
+    'numpy': numpy.__version__,
+    'casadi': getattr(casadi,'__version__','unknown'),
+    'commit': commit(),
+    'date': datetime.datetime.now().isoformat()}
+
+def peakMemory(fn):
+  """ Increase of the peak resident set size [kB] caused by fn, measured in a forked process """
+  import multiprocessing, resource
+  def child(q):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fn()
+    q.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+  q = multiprocessing.Queue()
+  p = multiprocessing.Process(target=child,args=(q,))
+  p.start()
+  m = q.get()
+  p.join()
+  return m
+
+def save(results,filename):
+  json.dump(results,open(filename,'w'),indent=1)
+
+def load(filename):
+  return json.load(open(filename,'r'))
+
+def compare(old,new,key,threshold=0.1):
+  """ Returns the pairs (row, old value) of new that are worse than old by more than threshold (relative)
+
+  For every metric, larger is worse. Rows are matched by key(row).
+  """
+  reference = dict((key(r),r) for r in old['results'])
+  regressions = []
+  for r in new['results']:
+    if key(r) not in reference:
+      continue
+    before = reference[key(r)]['value']
+    if r['value'] > before*(1+threshold):
+      regressions.append((r,before))
+  return regressions
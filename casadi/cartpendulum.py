@@ -1,5 +1,9 @@
 from casadi import *
 import numpy as n
+import ipoptprofile
+from lagrange import Lagrangian
+from simulation import IntervalSimulator
+from time import time
 
 q  = ssym("[x,theta]")
 x,theta = q
@@ -25,31 +29,13 @@ E = L/2*cos(theta)*g
 # Kinetic energy of the system
 T = 1.0/2*m*(dx)**2 + I*dtheta**2/2 + 1.0/2*M*mul(vp.T,vp)
 
-# The lagrangian
-L = E + T
+# The lagrangian L = E + T, i.e. a potential V = -E
+lagrangian = Lagrangian(T,-E,q,dq,vertcat([F-c*dx,-C*dtheta]))
 
-print L
-
-W = jacobian(L,dq)
-
-eq = SXMatrix(2,1,0)
-
-forcing = vertcat([F-c*dx,-C*dtheta])
-
-# implicit form of lagrange
-for i in range(2):
-  eq[i] = mul(jacobian(W[i],q),dq) + mul(jacobian(W[i],dq),ddq) - jacobian(L,q[i]) - forcing[i]
-
-  
-A = SXMatrix(2,2)
-b = SXMatrix(2,1,0)
-  
-for i in range(2):
-  A[i,:] = jacobian(W[i],dq)
-  b[i]   = - mul(jacobian(A[i],q),dq) + jacobian(L,q[i]) + forcing[i]
+print T + E
 
 ## Start intermezzo - linearized form
-rhs = vertcat([dq,mul(inv(A),b)])
+rhs = lagrangian.rhs
 
 rhs_linear=mtaylor(rhs,[theta,dtheta],[0,0],1)
 
@@ -57,8 +43,7 @@ J = jacobian(rhs_linear,v)
 ## End intermezzo 
 
 # ODE form
-f = SXFunction([t,v,par,[]],[rhs])
-f.init()
+f = lagrangian.odeFunction(t,par)
 I = CVodesIntegrator(f)
 I.init()
 
@@ -105,6 +90,7 @@ f.init()
 I = CVodesIntegrator(f)
 I.init()
 I_original = I
+f_original = f
 
 # ODE form
 f = SXFunction([tau,v,vertcat([F,T]),[]],[rhs_s*T])
@@ -128,7 +114,7 @@ ms.setOption("parallelization","expand")
 ms.setOption("number_of_grid_points",ns)
 ms.setOption("number_of_parameters",1)
 ms.setOption("nlp_solver",IpoptSolver)
-ms.setOption("nlp_solver_options",{"max_iter": 200,"monitor": ["eval_f"], "derivative_test" : "first-order"})
+ms.setOption("nlp_solver_options",ipoptprofile.instrument({"max_iter": 200, "derivative_test" : "first-order"},"cartpendulum_ipopt.out"))
 ms.init()
 
 from numpy import inf
@@ -156,6 +142,10 @@ print ms.input(OCP_LBX)
 print ms.input(OCP_UBX)
 ms.solve()
 
+profile = ipoptprofile.parseLog("cartpendulum_ipopt.out")
+ipoptprofile.save(profile,"cartpendulum_ipopt.json")
+print ipoptprofile.summary(profile)
+
 print "t=", ms.output(OCP_P_OPT)
 
 print ms.output(OCP_X_OPT)
@@ -181,21 +171,11 @@ print ms.getNLPSolver().reportConstraints()
 T = float(ms.output(OCP_P_OPT))
 print T
 
-results = []
-t = []
-for i in range(ns):
-  tsim = n.linspace(float(ms.input(OCP_T)[i])*T,float(ms.input(OCP_T)[i+1])*T,100)
-  sim = Simulator(I_original,tsim)
-  sim.init()
-  sim.input(INTEGRATOR_X0).set(ms.output(OCP_X_OPT)[:,i])
-  sim.input(INTEGRATOR_P).set(ms.output(OCP_U_OPT)[:,i])
-  sim.evaluate()
-  results.append(n.array(sim.output()))
-  t.append(tsim)
-
-
-results = n.vstack(results)
-t = n.hstack(t)
+# Simulate all intervals with one reused simulator
+t0 = time()
+tgrid = ms.input(OCP_T).toArray().ravel()*T
+t, results = IntervalSimulator(I_original,f_original,100).simulate(tgrid,ms.output(OCP_X_OPT).toArray()[:,:ns],ms.output(OCP_U_OPT).toArray())
+print "post-processing simulation: %f [s]" % (time()-t0)
 
 print t.shape
 print results.shape
@@ -203,6 +183,6 @@ print results.shape
 
 from pylab import *
 
-plot(t,r[:,0],'r',t,r[:,1],'g')
+plot(t,results[:,0],'r',t,results[:,1],'g')
 
 show()
@@ -0,0 +1,93 @@
+""" Choosing how to compute Jacobians
+
+For a function f, the Jacobian can be obtained as
+
+  symbolic : f.jacobian(), a new SXFunction (SXFunction only)
+  forward  : Jacobian(f) with ad_mode "forward" (one sweep per input)
+  adjoint  : Jacobian(f) with ad_mode "adjoint" (one sweep per output)
+  fd       : forward finite differences (one evaluation of f per input)
+
+Which one is fastest depends on the shape of f. profileJacobians measures
+all of them; selectADMode picks the cheapest and caches the choice per
+function shape, so production code only pays for the measurement once.
+
+benchtools is imported from casadi/, which must be on the path
+(PYTHONPATH=..).
+"""
+
+from numpy import *
+from casadi import *
+import json
+import os
+from time import time
+from benchtools import peakMemory
+from lm import fxCallable
+
+def _evaluator(fx):
+  fx.init()
+  return fxCallable(fx)
+
+def _fd(f,h=1e-6):
+  def evaluate(x):
+    x = array(x,dtype=float).ravel()
+    f.input().set(x)
+    f.evaluate()
+    f0 = f.output().toArray().ravel()
+    J = zeros((len(f0),len(x)))
+    for i in range(len(x)):
+      xi = x.copy()
+      xi[i]+= h
+      f.input().set(xi)
+      f.evaluate()
+      J[:,i] = (f.output().toArray().ravel()-f0)/h
+    return J
+  return evaluate
+
+def jacobianModes(f):
+  """ Returns a dict mode -> builder; a builder returns a callable x -> dense Jacobian """
+  def ad(mode):
+    def build():
+      J = Jacobian(f)
+      J.setOption("ad_mode",mode)
+      return _evaluator(J)
+    return build
+  modes = {'forward': ad("forward"), 'adjoint': ad("adjoint"), 'fd': lambda: _fd(f)}
+  if isinstance(f,SXFunction):
+    modes['symbolic'] = lambda: _evaluator(f.jacobian())
+  return modes
+
+def buildJacobian(f,mode):
+  return jacobianModes(f)[mode]()
+
+def profileJacobians(f,x,number=3,memory=True):
+  """ Construction time, evaluation time [s] and peak memory [kB] of every mode """
+  results = {}
+  for mode, build in jacobianModes(f).items():
+    t0=time()
+    J = build()
+    construction = time()-t0
+    J(x)
+    t0=time()
+    for i in range(number):
+      J(x)
+    results[mode] = {'construction': construction, 'evaluate': (time()-t0)/number}
+    if memory:
+      results[mode]['memory'] = peakMemory(lambda: build()(x))
+  return results
+
+def fastest(results,uses=100):
+  """ The mode with the least total time for construction plus uses evaluations """
+  cost = lambda r: r['construction'] + uses*r['evaluate']
+  return sorted(results.keys(),key=lambda mode: cost(results[mode]))[0]
+
+def shapeKey(f):
+  return "%s %d->%d" % (f.__class__.__name__,f.input().size(),f.output().size())
+
+def selectADMode(f,x,cache="admode.json",uses=100):
+  """ The fastest Jacobian mode for functions shaped like f, measured once per shape """
+  choices = json.load(open(cache)) if os.path.exists(cache) else {}
+  key = shapeKey(f)
+  if key not in choices:
+    choices[key] = fastest(profileJacobians(f,x,memory=False),uses)
+    json.dump(choices,open(cache,"w"),indent=1)
+  return choices[key]
@@ -0,0 +1,78 @@
+""" Native code for SXFunctions
+
+CompiledFunction generates C code for an SXFunction, compiles it into a
+shared library and calls it through ctypes. It mimics the part of the FX
+interface used by the scripts (input, evaluate, output), so it can stand
+in for the interpreted function.
+
+ctypes never unloads a library, and loading a path again returns the
+library already loaded there. Every build is therefore compiled to a
+path named after a hash of its generated code, so rebuilding a function
+of the same name (e.g. for a different N) never calls stale code.
+"""
+
+from numpy import *
+from ctypes import CDLL, POINTER, c_double, c_int, byref
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+class CompiledFunction:
+  def __init__(self,fx,name,directory=".",compiler="gcc",flags=["-O2"]):
+    """ fx must be an initialized SXFunction; name is the basename of the generated files """
+    self.fx = fx
+    build = tempfile.mkdtemp()
+    try:
+      c = os.path.join(build,name+".c")
+      fx.generateCode(c)
+      digest = hashlib.sha1(open(c,'rb').read()+" ".join([compiler]+list(flags))).hexdigest()[:16]
+      so = os.path.abspath(os.path.join(directory,"%s_%s.so" % (name,digest)))
+      if not os.path.exists(so):
+        tmp = os.path.join(build,name+".so")
+        subprocess.check_call([compiler,"-shared","-fPIC"]+list(flags)+["-o",tmp,c])
+        shutil.move(tmp,so)
+    finally:
+      shutil.rmtree(build)
+    self.so = so
+    self.lib = CDLL(so)
+
+    n_in, n_out = c_int(), c_int()
+    self.lib.init(byref(n_in),byref(n_out))
+    assert(n_in.value==fx.getNumInputs() and n_out.value==fx.getNumOutputs())
+    for i in range(n_in.value):
+      self._checkSparsity(i,fx.input(i))
+    for i in range(n_out.value):
+      self._checkSparsity(n_in.value+i,fx.output(i))
+
+    # Buffers hold the nonzeros, in the storage order of the function's own matrices
+    self.inputs = [zeros(fx.input(i).size()) for i in range(n_in.value)]
+    self.outputs = [zeros(fx.output(i).size()) for i in range(n_out.value)]
+    pointers = lambda buffers: (POINTER(c_double)*len(buffers))(*[b.ctypes.data_as(POINTER(c_double)) for b in buffers])
+    self._x = pointers(self.inputs)
+    self._r = pointers(self.outputs)
+
+  def _checkSparsity(self,i,M):
+    """ Asserts that argument i of the library (inputs first, then outputs) has the shape and nonzeros of M """
+    nrow, ncol = c_int(), c_int()
+    rowind, col = POINTER(c_int)(), POINTER(c_int)()
+    self.lib.getSparsity(i,byref(nrow),byref(ncol),byref(rowind),byref(col))
+    assert (nrow.value,ncol.value)==(M.size1(),M.size2()), "%s: argument %d is %dx%d, expected %dx%d" % (self.so,i,nrow.value,ncol.value,M.size1(),M.size2())
+    assert rowind[nrow.value]==M.size(), "%s: argument %d has %d nonzeros, expected %d" % (self.so,i,rowind[nrow.value],M.size())
+
+  def init(self):
+    pass
+
+  def input(self,i=0):
+    return self.fx.input(i)
+
+  def output(self,i=0):
+    return self.fx.output(i)
+
+  def evaluate(self):
+    for i in range(len(self.inputs)):
+      self.inputs[i][:] = self.fx.input(i).toArray().ravel()
+    self.lib.evaluate(self._x,self._r)
+    for i in range(len(self.outputs)):
+      self.fx.output(i).set(self.outputs[i])
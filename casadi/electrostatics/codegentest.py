@@ -0,0 +1,44 @@
+from numpy import *
+from casadi import *
+import numpy
+from residual import buildResidual
+from codegen import CompiledFunction
+from lm import LevenbergMarquardt, fxCallable
+from timeit import timeit
+
+from time import time
+
+# t_f and t_J of the LM loop with interpreted versus generated functions
+
+m=3
+n1=3
+n2=14 # n2/n3: must be integer and even
+n3=2 # n2/n3: must be integer and even
+
+superformula = lambda phi: ((cos(m*phi/4))**n2+(sin(m*phi/4))**n3)**(-1/n1)
+
+for N in [50,100,200]:
+  print "N = %d" % N
+  phi, F, post = buildResidual(N,superformula)
+  
+  f = SXFunction([phi],[F])
+  f.init()
+  J_ad = Jacobian(f)
+  J_ad.init()
+  J_sx = f.jacobian()
+  J_sx.init()
+  
+  t0=time()
+  f_c = CompiledFunction(f,"codegentest_f")
+  J_c = CompiledFunction(J_sx,"codegentest_J")
+  print "  generation and compilation: %f [s]" % (time()-t0)
+  
+  x_ = numpy.linspace(0,2*pi*(1-1.0/N),N)
+  for name, fx in [("f interpreted",f),("f generated",f_c),("J = Jacobian(f)",J_ad),("J = f.jacobian()",J_sx),("J generated",J_c)]:
+    fx.input().set(x_)
+    print "  %-18s %e [s] per call" % (name,timeit(fx.evaluate,number=20)/20)
+  
+  for name, f_, J_ in [("interpreted",f,J_ad),("generated",f_c,J_c)]:
+    solver = LevenbergMarquardt(fxCallable(f_),fxCallable(J_),tol=1e-9,verbose=False)
+    solver.solve(x_)
+    print "  LM %s: t_f = %f [s], t_J = %f [s] (%d iterations)" % (name,solver.t_f,solver.t_J,solver.iterations)
@@ -0,0 +1,155 @@
+""" Continuation over the superformula parameters (m, n1, n2, n3)
+
+The residual is built once, with the shape parameters as a second input
+of the function instead of constants folded into the expression tree.
+A sweep then only changes the numeric value of that input, and every
+solve is warm-started from the solution at the previous parameters.
+
+When a solve fails, the parameter step is halved and retried; paths with
+large jumps are thus followed through intermediate shapes.
+"""
+
+from numpy import *
+from casadi import *
+import numpy
+from residual import buildResidual
+from codegen import CompiledFunction
+from lm import LevenbergMarquardt, fxCallable
+
+from time import time
+
+def superformula(phi,p):
+  """ r(phi) for the parameters p = [m,n1,n2,n3]
+
+  |cos| and |sin| coincide with cos and sin for the even n2, n3 the
+  scripts require, and keep the curve defined at the intermediate,
+  non-integer exponents visited by the continuation. The exponent is
+  -1/n1 in floating point; n1=1 gives the curve of the other scripts.
+  """
+  m, n1, n2, n3 = p[0], p[1], p[2], p[3]
+  return ((fabs(cos(m*phi/4)))**n2+(fabs(sin(m*phi/4)))**n3)**(-1.0/n1)
+
+class Continuation:
+  def __init__(self,N,codegen=False,tol=1e-9,max_iter=1000,min_step=1.0/64):
+    """ Builds the residual F(phi,p) of N charges and its Jacobian with respect to phi """
+    self.N = N
+    self.min_step = min_step
+    t0=time()
+    self.p = symbolic("p",4,1)
+    self.phi, F, self.post = buildResidual(N,lambda phi: superformula(phi,self.p))
+    f = SXFunction([self.phi,self.p],[F])
+    f.init()
+    J = f.jacobian(0,0)
+    J.init()
+    if codegen:
+      f = CompiledFunction(f,"continuation_f")
+      J = CompiledFunction(J,"continuation_J")
+    self.f = f
+    self.J = J
+    self.t_construction = time()-t0
+    params = lambda: [self.params]
+    self.solver = LevenbergMarquardt(fxCallable(f,inputs=params),fxCallable(J,inputs=params),tol=tol,max_iter=max_iter,verbose=False)
+
+  def initialGuess(self):
+    """ Evenly spaced angles """
+    return array(numpy.linspace(0,2*pi*(1-1.0/self.N),self.N),ndmin=2).T
+
+  def solve(self,params,x0):
+    """ Solves at the parameters params from x0; returns the solution and its statistics """
+    self.params = array(params,dtype=float)
+    t0=time()
+    try:
+      x = self.solver.solve(x0)
+      converged = self.solver.converged
+    except numpy.linalg.LinAlgError:
+      x = x0
+      converged = False
+    return x, {'params': list(self.params), 'converged': converged,
+               'iterations': self.solver.iterations, 'rejected': self.solver.rejected,
+               'residual': self.solver.residual if hasattr(self.solver,'residual') else nan,
+               'time': time()-t0}
+
+  def sweep(self,path,x0=None):
+    """ Follows the parameter path (a list of [m,n1,n2,n3]), warm-starting every solve
+
+    Returns the solutions at the points of path and the statistics of all
+    solves, including the intermediate ones of halved steps. If a point is
+    not reached, its solution is None and the sweep stops there; the
+    residual is left at the last parameters that converged.
+    """
+    x = self.initialGuess() if x0 is None else x0
+    previous = None
+    converged = None
+    solutions = []
+    stats = []
+    for target in path:
+      target = array(target,dtype=float)
+      if previous is None:
+        x_, s = self.solve(target,x)
+        stats.append(s)
+        reached = s['converged']
+        if reached:
+          x = x_
+          converged = self.params
+      else:
+        # Move from previous towards target, halving the step on failure
+        s_done, step = 0.0, 1.0
+        while s_done < 1:
+          step = minimum(step,1-s_done)
+          params = previous + (s_done+step)*(target-previous)
+          x_, s = self.solve(params,x)
+          stats.append(s)
+          if s['converged']:
+            x = x_
+            converged = self.params
+            s_done+= step
+            step*= 2
+          elif step > self.min_step:
+            step/= 2
+          else:
+            break
+        reached = s_done >= 1
+      if not reached:
+        solutions.append(None)
+        if converged is not None:
+          self.params = converged
+        break
+      previous = target
+      solutions.append(x)
+    return solutions, stats
+
+  def positions(self,x):
+    """ The post-processing quantities [x,y,tx,ty,Fx_,Fy_] at the solution x """
+    f = SXFunction([self.phi,self.p],self.post)
+    f.init()
+    f.input(0).set(x)
+    f.input(1).set(self.params)
+    f.evaluate()
+    return [f.output(i).toArray() for i in range(f.getNumOutputs())]
+
+if __name__ == "__main__":
+  N=100
+
+  # Sweep m at fixed n1, n2, n3. The scripts' (-1/n1) with n1=3 is integer
+  # division under Python 2, i.e. the exponent -1: n1=1 here is their curve
+  path = [[m,1,14,2] for m in linspace(3,6,13)]
+
+  c_ = Continuation(N)
+  print "construction: %f [s]" % c_.t_construction
+
+  t0=time()
+  solutions, stats = c_.sweep(path)
+  t_sweep = time()-t0
+
+  print "%20s %10s %10s %10s %10s" % ("m,n1,n2,n3","converged","iterations","residual","time [s]")
+  for s in stats:
+    print "%20s %10s %10d %10.2e %10.4f" % (",".join("%g" % v for v in s['params']),s['converged'],s['iterations'],s['residual'],s['time'])
+  print "continuation sweep: %f [s], %d iterations" % (t_sweep,array([s['iterations'] for s in stats]).sum())
+
+  # The same sweep, cold-started from the evenly spaced guess every time
+  t0=time()
+  iterations = 0
+  for params in path:
+    x, s = c_.solve(params,c_.initialGuess())
+    iterations+= s['iterations']
+  print "cold-start sweep: %f [s], %d iterations" % (time()-t0,iterations)
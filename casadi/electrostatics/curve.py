@@ -0,0 +1,24 @@
+from numpy import *
+from casadi import *
+
+def tangents(phi,superformula):
+  """ Unit tangents (tx, ty) of the curve r = superformula(phi), for every entry of the SX vector phi
+  
+  x_i only depends on phi_i, so jacobian(x,phi) is diagonal; multiplying it
+  by a vector of ones extracts that diagonal in a single sparse operation,
+  instead of evaluating a scalar tangent function once per point.
+  """
+  r = superformula(phi)
+  ones = SXMatrix(phi.size1(),1,1)
+  tx = mul(jacobian(r*cos(phi),phi),ones)
+  ty = mul(jacobian(r*sin(phi),phi),ones)
+  n = sqrt(tx**2+ty**2)
+  return tx/n, ty/n
+
+def tangentFunction(N,superformula):
+  """ An SXFunction phi -> (tx, ty) for N points, e.g. to be called once on an MX vector """
+  a = symbolic("a",N,1)
+  tx, ty = tangents(a,superformula)
+  f = SXFunction([a],[tx,ty])
+  f.init()
+  return f
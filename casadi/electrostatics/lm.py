@@ -0,0 +1,184 @@
+""" Levenberg-Marquardt solver for square or overdetermined systems f(x) = 0
+
+Each iteration solves
+
+  (J'J + lambda diag(J'J)) dx = -J'f
+
+and accepts the step if it reduces |f|, decreasing lambda, or rejects it
+and increases lambda.
+
+Factorizations:
+
+  'eigen'    : J'J scaled by diag(J'J) is eigendecomposed once per Jacobian,
+               so a change of lambda (a rejected step) is only an O(N^2) re-solve.
+  'cholesky' : one Cholesky factorization per (J, lambda) pair.
+
+A scipy.sparse Jacobian is handled with a sparse J'J and a sparse
+Cholesky factorization from CHOLMOD (scikits.sparse), whose symbolic
+analysis is done once per solve since the pattern of J'J does not change.
+Without scikits.sparse, a sparse LU factorization is used instead.
+
+The time spent in f, J, the factorizations and the solves is accumulated
+in t_f, t_J, t_factor and t_solve.
+
+fxCallable turns an initialized CasADi function into the f(x) or J(x)
+the solver expects.
+"""
+
+from numpy import *
+from numpy.linalg import norm, eigh
+from scipy.linalg import cho_factor, cho_solve
+import scipy.sparse
+import scipy.sparse.linalg
+from time import time
+
+try:
+  from scikits.sparse.cholmod import analyze
+except ImportError:
+  analyze = None
+
+def toSparse(M):
+  """ The DMatrix M as a scipy.sparse matrix, handing over its compressed row storage """
+  sp = M.sparsity()
+  return scipy.sparse.csr_matrix((array(M.data()),array(sp.col()),array(sp.rowind())),shape=(sp.size1(),sp.size2()))
+
+def fxCallable(fx,sparse=False,inputs=None):
+  """ x -> the first output of fx at x, dense or (sparse=True) scipy.sparse
+
+  inputs: a callable returning the values of the remaining inputs, read at
+  every call (e.g. parameters that change between solves)
+  """
+  def evaluate(x):
+    fx.input(0).set(x)
+    if inputs is not None:
+      for i,value in enumerate(inputs()):
+        fx.input(i+1).set(value)
+    fx.evaluate()
+    if sparse:
+      return toSparse(fx.output())
+    return fx.output().toArray()
+  return evaluate
+
+class LevenbergMarquardt:
+  def __init__(self,f,J,tol=1e-9,lambd=0.001,lambd_min=1e-16,lambd_max=1e10,max_iter=1000,factorization='eigen',verbose=True):
+    """ f(x) returns the residual vector and J(x) its Jacobian (dense or scipy.sparse) """
+    self.f = f
+    self.J = J
+    self.tol = tol
+    self.lambd0 = lambd
+    self.lambd_min = lambd_min
+    self.lambd_max = lambd_max
+    self.max_iter = max_iter
+    self.factorization = factorization
+    self.verbose = verbose
+
+  def _f(self,x):
+    t0=time()
+    r = asarray(self.f(x),dtype=float).ravel()
+    self.t_f+= time()-t0
+    self.nf+= 1
+    return r
+
+  def _J(self,x):
+    t0=time()
+    J = self.J(x)
+    self.t_J+= time()-t0
+    self.nJ+= 1
+    return J
+
+  def _factorize(self,J):
+    """ Prepares everything that does not depend on lambda """
+    t0=time()
+    if scipy.sparse.issparse(J):
+      JJ = (J.T*J).tocsc()
+      D = JJ.diagonal()
+      factor = ('sparse',JJ,D)
+    else:
+      J = asarray(J)
+      JJ = dot(J.T,J)
+      D = diag(JJ).copy()
+      if self.factorization=='eigen':
+        # Scaled so that the lambda term becomes lambda*I
+        s = 1/sqrt(where(D>0,D,1))
+        w, V = eigh(JJ*s[:,newaxis]*s[newaxis,:])
+        factor = ('eigen',w,V,s)
+      else:
+        factor = ('cholesky',JJ,D)
+    self.t_factor+= time()-t0
+    return factor
+
+  def _solve(self,factor,g,lambd):
+    """ Solves (J'J + lambd diag(J'J)) dx = g """
+    t0=time()
+    t_factor = self.t_factor
+    if factor[0]=='eigen':
+      _, w, V, s = factor
+      dx = s*dot(V,dot(V.T,s*g)/(w+lambd))
+    elif factor[0]=='cholesky':
+      _, JJ, D = factor
+      t1=time()
+      c = cho_factor(JJ+diag(D*lambd))
+      self.t_factor+= time()-t1
+      dx = cho_solve(c,g)
+    else:
+      _, JJ, D = factor
+      t1=time()
+      A = (JJ+scipy.sparse.diags(D*lambd,0)).tocsc()
+      if analyze is not None:
+        if self._analysis is None:
+          self._analysis = analyze(A)
+        solve = self._analysis.cholesky(A)
+      else:
+        solve = scipy.sparse.linalg.splu(A).solve
+      self.t_factor+= time()-t1
+      dx = solve(g)
+    # Factorizations for the new lambda are accounted for in t_factor
+    self.t_solve+= time()-t0-(self.t_factor-t_factor)
+    return dx
+
+  def solve(self,x0):
+    """ Returns the solution, with the shape of x0 """
+    self.t_f = self.t_J = self.t_factor = self.t_solve = 0
+    self.nf = self.nJ = self.iterations = self.rejected = 0
+    self._analysis = None
+    shape_ = asarray(x0).shape
+    x = array(x0,dtype=float).ravel()
+    lambd = self.lambd0
+
+    f_ = self._f(x)
+    J_ = self._J(x)
+    factor = self._factorize(J_)
+    g = -(J_.T*f_ if scipy.sparse.issparse(J_) else dot(asarray(J_).T,f_))
+
+    while norm(f_) > self.tol and self.iterations < self.max_iter:
+      dx = self._solve(factor,g,lambd)
+      fn_ = self._f(x+dx)
+
+      # Did the residual shrink after taking a tentative step?
+      if norm(fn_) < norm(f_):
+        # If yes, make the step definitive and decrease lambda
+        x+= dx
+        lambd = maximum(lambd/10,self.lambd_min)
+        f_ = fn_
+        J_ = self._J(x)
+        factor = self._factorize(J_)
+        g = -(J_.T*f_ if scipy.sparse.issparse(J_) else dot(asarray(J_).T,f_))
+      else:
+        # If no, forget the step; only lambda changes, so the factorization is kept
+        lambd = minimum(lambd*10,self.lambd_max)
+        self.rejected+= 1
+      self.iterations+= 1
+      if self.verbose:
+        print("%g %g" % (norm(f_),lambd))
+
+    self.residual = norm(f_)
+    self.converged = self.residual <= self.tol
+    return x.reshape(shape_)
+
+  def report(self):
+    return "\n".join([
+      "%d steps for convergence (%d rejected)" % (self.iterations,self.rejected),
+      "duration factorization: %f [s]" % self.t_factor,
+      "duration linear solve: %f [s]" % self.t_solve,
+      "duration f: %f [s]" % self.t_f,
+      "duration J: %f [s]" % self.t_J])
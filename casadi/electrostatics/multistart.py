@@ -0,0 +1,104 @@
+""" Multi-start solution of the equilibrium problem
+
+The residual and its Jacobian are built and compiled once by setup(); the
+worker processes are forked afterwards and share them. Every start is
+solved with Levenberg-Marquardt, and the converged solution with the
+lowest electrostatic energy wins.
+"""
+
+from numpy import *
+from casadi import *
+import numpy
+from residual import buildResidual
+from codegen import CompiledFunction
+from lm import LevenbergMarquardt, fxCallable
+import multiprocessing
+
+from time import time
+
+_problem = {}
+
+def setup(N,superformula,codegen=True):
+  """ Builds (and compiles) the residual, its Jacobian and the particle positions for N charges """
+  phi, F, post = buildResidual(N,superformula)
+  f = SXFunction([phi],[F])
+  f.init()
+  J = f.jacobian()
+  J.init()
+  xy = SXFunction([phi],post[:2])
+  xy.init()
+  if codegen:
+    f = CompiledFunction(f,"multistart_f")
+    J = CompiledFunction(J,"multistart_J")
+  _problem.update({'N': N, 'f': f, 'J': J, 'xy': xy})
+
+def energy(phi):
+  """ Coulomb energy sum_{i<j} 1/r_ij of the configuration phi """
+  xy = _problem['xy']
+  xy.input().set(phi)
+  xy.evaluate()
+  x = xy.output(0).toArray().ravel()
+  y = xy.output(1).toArray().ravel()
+  r = sqrt((x[:,newaxis]-x[newaxis,:])**2 + (y[:,newaxis]-y[newaxis,:])**2)
+  return (1/r[triu_indices(len(x),1)]).sum()
+
+def solveStart(x0,tol=1e-9,max_iter=1000):
+  """ Solves from one initial guess, returning the solution and its convergence statistics """
+  t0=time()
+  solver = LevenbergMarquardt(fxCallable(_problem['f']),fxCallable(_problem['J']),tol=tol,max_iter=max_iter,verbose=False)
+  try:
+    x = solver.solve(x0)
+    converged = solver.converged
+  except numpy.linalg.LinAlgError:
+    x = array(x0,dtype=float)
+    converged = False
+  return {'x': x, 'energy': energy(x), 'converged': converged,
+          'iterations': solver.iterations, 'rejected': solver.rejected,
+          'residual': getattr(solver,'residual',nan), 'time': time()-t0,
+          't_f': solver.t_f, 't_J': solver.t_J, 't_solve': solver.t_solve + solver.t_factor}
+
+def perturbedStarts(N,n,scale=0.1,seed=0):
+  """ n initial guesses: evenly spaced angles with random perturbations (the first is unperturbed) """
+  numpy.random.seed(seed)
+  base = numpy.linspace(0,2*pi*(1-1.0/N),N)
+  return [base] + [sort(base + scale*2*pi/N*numpy.random.randn(N)) for i in range(n-1)]
+
+def multiStart(starts,processes=None):
+  """ Solves all starts in a process pool; returns the best result and all of them """
+  if processes==1:
+    results = map(solveStart,starts)
+  else:
+    pool = multiprocessing.Pool(processes)
+    results = pool.map(solveStart,starts)
+    pool.close()
+    pool.join()
+  converged = [r for r in results if r['converged']]
+  best = sorted(converged,key=lambda r: r['energy'])[0] if converged else None
+  return best, results
+
+if __name__ == "__main__":
+  N=100
+
+  m=3
+  n1=3
+  n2=14 # n2/n3: must be integer and even
+  n3=2 # n2/n3: must be integer and even
+
+  superformula = lambda phi: ((cos(m*phi/4))**n2+(sin(m*phi/4))**n3)**(-1/n1)
+
+  t0=time()
+  setup(N,superformula)
+  print "setup: %f [s]" % (time()-t0)
+
+  starts = perturbedStarts(N,16)
+
+  for processes in [1,2,4,multiprocessing.cpu_count()]:
+    t0=time()
+    best, results = multiStart(starts,processes)
+    print "%d processes: %f [s]" % (processes,time()-t0)
+
+  print "%5s %10s %10s %10s %10s %10s" % ("start","converged","iterations","residual","energy","time [s]")
+  for i,r in enumerate(results):
+    print "%5d %10s %10d %10.2e %10.6f %10.4f" % (i,r['converged'],r['iterations'],r['residual'],r['energy'],r['time'])
+  if best is not None:
+    print "lowest energy: %f" % best['energy']
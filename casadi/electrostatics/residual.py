@@ -0,0 +1,90 @@
+from numpy import *
+from casadi import *
+import casadi as c
+from curve import tangents
+
+def buildResidual(N,superformula):
+  """ The equilibrium residual of N charges on the curve r = superformula(phi)
+  
+  Returns the decision variables phi, the residual F (the Coulomb force
+  projected on the local tangents) and the list [x,y,tx,ty,Fx_,Fy_] used
+  for post-processing.
+  """
+  # The angle used in the parametrisation of the curve serves as decision variables
+  phi = symbolic("phi",N,1)
+
+  r = superformula(phi)
+  x = r*cos(phi)
+  y = r*sin(phi)
+
+  # Evaluating the tangent for all points at once
+  tx, ty = tangents(phi,superformula)
+
+  # taxicab distance matrix
+  dx = repmat(x,1,N)-repmat(x.T,N,1)
+  dy = repmat(y,1,N)-repmat(y.T,N,1)
+
+  # distance^2 matrix
+  N_ = dx**2+dy**2
+
+  # Denominator of Coulomb force
+  D = N_**(-3/2.0)
+
+  # k-indices to get diagonal elements
+  diagonal_k = list(getNZDense(sp_diag(N)))
+
+  # No self-interaction
+  D[diagonal_k]=SX(0)
+
+  # Summing all force contributions
+  Fx_ = c.sum(D*dx,1)
+  Fy_ = c.sum(D*dy,1)
+
+  # Projecting the forces on the local tangents
+  F = Fx_*tx+Fy_*ty
+  
+  return phi, F, [x,y,tx,ty,Fx_,Fy_]
+
+def buildScreenedResidual(N,superformula,bandwidth,screening=None):
+  """ The equilibrium residual with interactions truncated to the bandwidth nearest charges
+  
+  Charge i only interacts with the charges i-bandwidth .. i+bandwidth
+  (cyclically), i.e. its neighbours along the curve; with 2*bandwidth >= N
+  it interacts with all others, as in buildResidual. With a screening
+  length, the Coulomb potential 1/r is replaced by exp(-r/screening)/r.
+  Instead of N x N matrices, the sums run over index offsets, so the
+  expression graph and the Jacobian have O(N*bandwidth) nonzeros and the
+  Jacobian is banded (with cyclic corners).
+  
+  Returns the same triple as buildResidual.
+  """
+  phi = symbolic("phi",N,1)
+
+  r = superformula(phi)
+  x = r*cos(phi)
+  y = r*sin(phi)
+
+  tx, ty = tangents(phi,superformula)
+
+  Fx_ = SXMatrix(N,1,0)
+  Fy_ = SXMatrix(N,1,0)
+  for k in range(1,min(bandwidth,N//2)+1):
+    # The neighbour at offset +k and -k of every charge; for even N, the
+    # one at offset N/2 is both
+    for shift in ([k] if 2*k==N else [k,N-k]):
+      j = [(i+shift)%N for i in range(N)]
+      dx = x-x[j]
+      dy = y-y[j]
+      N_ = dx**2+dy**2
+      if screening is None:
+        w = N_**(-3/2.0)
+      else:
+        # -d/dr (exp(-r/s)/r) / r
+        r_ = sqrt(N_)
+        w = exp(-r_/screening)*(1/(r_*N_) + 1/(screening*N_))
+      Fx_+= w*dx
+      Fy_+= w*dy
+
+  F = Fx_*tx+Fy_*ty
+
+  return phi, F, [x,y,tx,ty,Fx_,Fy_]
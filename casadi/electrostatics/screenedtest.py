@@ -0,0 +1,37 @@
+from numpy import *
+from casadi import *
+import numpy
+from residual import buildScreenedResidual
+from lm import LevenbergMarquardt, fxCallable
+import lm
+
+from time import time
+
+# Screened (banded) interactions: construction and sparse LM solve times versus N
+
+m=3
+n1=3
+n2=14 # n2/n3: must be integer and even
+n3=2 # n2/n3: must be integer and even
+
+superformula = lambda phi: ((cos(m*phi/4))**n2+(sin(m*phi/4))**n3)**(-1/n1)
+
+bandwidth = 20
+
+print "sparse factorization: %s" % ("CHOLMOD" if lm.analyze is not None else "SuperLU")
+print "%8s %10s %8s %10s %10s %10s %10s" % ("N","nnz(J)","steps","t_build","t_f+t_J","t_factor","t_total")
+
+for N in [1000,3000,10000]:
+  t0=time()
+  phi, F, post = buildScreenedResidual(N,superformula,bandwidth)
+  f = SXFunction([phi],[F])
+  f.init()
+  J = f.jacobian()
+  J.init()
+  t_build = time()-t0
+
+  solver = LevenbergMarquardt(fxCallable(f),fxCallable(J,sparse=True),tol=1e-9,verbose=False)
+  t0=time()
+  solver.solve(numpy.linspace(0,2*pi*(1-1.0/N),N))
+  t_total = time()-t0
+  print "%8d %10d %8d %10.3f %10.3f %10.3f %10.3f" % (N,J.output().size(),solver.iterations,t_build,solver.t_f+solver.t_J,solver.t_factor,t_total)
@@ -0,0 +1,51 @@
+from numpy import *
+from casadi import *
+import numpy
+from curve import tangents, tangentFunction
+
+from time import time
+
+# Construction time of the tangents: one scalar function call per point
+# versus a single vectorized operation
+
+m=3
+n1=3
+n2=14 # n2/n3: must be integer and even
+n3=2 # n2/n3: must be integer and even
+
+superformula = lambda phi: ((cos(m*phi/4))**n2+(sin(m*phi/4))**n3)**(-1/n1)
+
+a=SX("a")
+r = superformula(a)
+dfp = SXFunction([a],[vertcat([jacobian(r*cos(a),a),jacobian(r*sin(a),a)])])
+dfp.init()
+
+for N in [100,1000]:
+  phi = symbolic("phi",N,1)
+  
+  t0=time()
+  t=SXMatrix(matrix([dfp.eval([phi[i]])[0] for i in range(phi.size())]))
+  tx=t[:,0]
+  ty=t[:,1]
+  n=sqrt(t[:,0]**2+t[:,1]**2)
+  tx/=n
+  ty/=n
+  t_sx_loop = time()-t0
+  
+  t0=time()
+  tx, ty = tangents(phi,superformula)
+  t_sx = time()-t0
+  
+  phi = MX("phi",N,1)
+  
+  t0=time()
+  t=horzcat([dfp.call([phi[i]])[0] for i in range(phi.size())]).T
+  t_mx_loop = time()-t0
+  
+  t0=time()
+  tx, ty = tangentFunction(N,superformula).call([phi])
+  t_mx = time()-t0
+  
+  print "N = %d" % N
+  print "  SX: per point %f [s], vectorized %f [s]" % (t_sx_loop,t_sx)
+  print "  MX: per point %f [s], vectorized %f [s]" % (t_mx_loop,t_mx)
@@ -0,0 +1,125 @@
+""" Barnes-Hut treecode for the Coulomb forces between unit charges in the plane
+
+Computes, for every particle i,
+
+  Fx_i = sum_j (x_i-x_j)/r_ij^3,  Fy_i = sum_j (y_i-y_j)/r_ij^3
+
+(the Fx_, Fy_ sums of the electrostatics scripts) in O(N log N) instead of
+building the dense N x N matrices.
+
+Particles are sorted into a quadtree. A cell seen from a target at distance
+d is replaced by its multipole expansion (monopole and quadrupole about its
+centre of charge) when width/d < theta and the target lies outside the
+cell; otherwise it is opened. Leaves are
+summed directly. The traversal is vectorized over groups of targets.
+"""
+
+from numpy import *
+
+class Cell:
+  def __init__(self,index,x,y,cx,cy,width):
+    self.index = index      # particles in this cell
+    self.cx = cx            # geometric centre of the cell
+    self.cy = cy
+    self.width = width
+    self.children = []
+    self.q = len(index)
+    # Centre of charge (the dipole moment about it vanishes)
+    self.mx = x[index].mean()
+    self.my = y[index].mean()
+    # In-plane part of the traceless quadrupole moment
+    dx = x[index] - self.mx
+    dy = y[index] - self.my
+    d2 = dx**2 + dy**2
+    self.Qxx = (3*dx**2 - d2).sum()
+    self.Qyy = (3*dy**2 - d2).sum()
+    self.Qxy = (3*dx*dy).sum()
+
+def buildTree(x,y,leaf_size=32,max_depth=30):
+  """ Returns the root Cell of the quadtree of the points (x,y) """
+  width = maximum(x.max()-x.min(),y.max()-y.min())*(1+1e-9) + 1e-300
+  root = Cell(arange(len(x)),x,y,(x.max()+x.min())/2,(y.max()+y.min())/2,width)
+  stack = [(root,0)]
+  while stack:
+    cell, depth = stack.pop()
+    if cell.q <= leaf_size or depth >= max_depth:
+      continue
+    xi = x[cell.index] >= cell.cx
+    yi = y[cell.index] >= cell.cy
+    w = cell.width/2
+    for east in [False,True]:
+      for north in [False,True]:
+        index = cell.index[(xi==east) & (yi==north)]
+        if len(index)==0:
+          continue
+        child = Cell(index,x,y,cell.cx+(w/2 if east else -w/2),cell.cy+(w/2 if north else -w/2),w)
+        cell.children.append(child)
+        stack.append((child,depth+1))
+  return root
+
+def coulombForces(x,y,theta=0.5,leaf_size=32,quadrupole=True):
+  """ Approximate Coulomb forces (Fx, Fy) on all particles
+
+  theta controls the accuracy: smaller is more accurate and slower.
+  theta=0 yields the exact (direct) sums.
+  """
+  x = asarray(x,dtype=float).ravel()
+  y = asarray(y,dtype=float).ravel()
+  Fx = zeros(len(x))
+  Fy = zeros(len(x))
+  stack = [(buildTree(x,y,leaf_size),arange(len(x)))]
+  while stack:
+    cell, targets = stack.pop()
+    Rx = x[targets] - cell.mx
+    Ry = y[targets] - cell.my
+    R2 = Rx**2 + Ry**2
+    # A target inside the cell (its own, in particular) is never far, however large theta
+    outside = maximum(abs(x[targets]-cell.cx),abs(y[targets]-cell.cy)) > cell.width/2
+    far = outside & (cell.width**2 < theta**2*R2)
+    if far.any():
+      t = targets[far]
+      rx, ry, r2 = Rx[far], Ry[far], R2[far]
+      r = sqrt(r2)
+      r3 = r*r2
+      fx = cell.q*rx/r3
+      fy = cell.q*ry/r3
+      if quadrupole:
+        # F = -grad( R'QR/(2 R^5) ) = -QR/R^5 + 5/2 (R'QR) R/R^7
+        Qrx = cell.Qxx*rx + cell.Qxy*ry
+        Qry = cell.Qxy*rx + cell.Qyy*ry
+        rQr = rx*Qrx + ry*Qry
+        r5 = r3*r2
+        fx+= -Qrx/r5 + 2.5*rQr*rx/(r5*r2)
+        fy+= -Qry/r5 + 2.5*rQr*ry/(r5*r2)
+      Fx[t]+= fx
+      Fy[t]+= fy
+    near = targets[~far]
+    if len(near)==0:
+      continue
+    if cell.children:
+      for child in cell.children:
+        stack.append((child,near))
+    else:
+      # Direct summation over the leaf, without self-interaction
+      dx = x[near][:,newaxis] - x[cell.index][newaxis,:]
+      dy = y[near][:,newaxis] - y[cell.index][newaxis,:]
+      N_ = dx**2 + dy**2
+      self_ = N_==0
+      N_[self_] = 1
+      D = N_**(-3/2.0)
+      D[self_] = 0
+      Fx[near]+= (D*dx).sum(1)
+      Fy[near]+= (D*dy).sum(1)
+  return Fx, Fy
+
+def denseForces(x,y):
+  """ The dense O(N^2) reference, as in withnumpy.py """
+  x = asarray(x,dtype=float).ravel()
+  y = asarray(y,dtype=float).ravel()
+  dx = x[:,newaxis] - x[newaxis,:]
+  dy = y[:,newaxis] - y[newaxis,:]
+  N_ = dx**2 + dy**2
+  fill_diagonal(N_,1)
+  D = N_**(-3/2.0)
+  fill_diagonal(D,0)
+  return (D*dx).sum(1), (D*dy).sum(1)
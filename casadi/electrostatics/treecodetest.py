@@ -0,0 +1,39 @@
+from numpy import *
+from treecode import coulombForces, denseForces
+from time import time
+
+# Accuracy versus speed of the treecode, against the dense reference of withnumpy.py
+
+m=3
+n1=3
+n2=14 # n2/n3: must be integer and even
+n3=2 # n2/n3: must be integer and even
+
+superformula = lambda phi: ((cos(m*phi/4))**n2+(sin(m*phi/4))**n3)**(-1/n1)
+
+print "%8s %6s %10s %10s %10s %10s" % ("N","theta","quadrupole","t_tree [s]","t_dense [s]","rel. error")
+
+for N in [100,1000,3000,10000,100000]:
+  phi = linspace(0,2*pi*(1-1.0/N),N)
+  r = superformula(phi)
+  x = r*cos(phi)
+  y = r*sin(phi)
+  
+  # The dense reference needs N^2 memory
+  if N <= 10000:
+    t0=time()
+    Fx0, Fy0 = denseForces(x,y)
+    t_dense = time()-t0
+  else:
+    t_dense = nan
+    
+  for theta in [0.3,0.5,0.8]:
+    for quadrupole in [False,True]:
+      t0=time()
+      Fx, Fy = coulombForces(x,y,theta=theta,quadrupole=quadrupole)
+      t_tree = time()-t0
+      if isnan(t_dense):
+        error = nan
+      else:
+        error = sqrt((Fx-Fx0)**2+(Fy-Fy0)**2).max()/sqrt(Fx0**2+Fy0**2).max()
+      print "%8d %6.1f %10s %10.4f %10.4f %10.2e" % (N,theta,quadrupole,t_tree,t_dense,error)
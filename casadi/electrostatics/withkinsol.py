@@ -2,6 +2,7 @@ from numpy import *
 from casadi import *
 import casadi as c
 import numpy
+from curve import tangents
 from pylab import *
 from numpy.linalg import solve, norm
 
@@ -20,29 +21,12 @@ n3=2
 
 superformula = lambda phi: ((cos(m*phi/4))**n2+(sin(m*phi/4))**n3)**(-1/n1)
 
-a=SX("a")
-
-r = superformula(a)
-x = r*cos(a)
-y = r*sin(a)
-fp = SXFunction([a],[[x,y]])
-fp.init()
-dfp = fp.jacobian()
-dfp.init()
-n=sqrt(x**2+y**2)
-
-
 r = superformula(phi)
 x = r*cos(phi)
 y = r*sin(phi)
 
 n=sqrt(x**2+y**2)
-t=SXMatrix(matrix([dfp.eval([phi[i]])[0] for i in range(phi.size())]))
-tx=t[:,0]
-ty=t[:,1]
-n=sqrt(t[:,0]**2+t[:,1]**2)
-tx/=n
-ty/=n
+tx, ty = tangents(phi,superformula)
 
 dx = repmat(x,1,N)-repmat(x.T,N,1)
 dy = repmat(y,1,N)-repmat(y.T,N,1)
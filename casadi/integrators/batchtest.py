@@ -0,0 +1,48 @@
+from casadi import *
+from integrators import *
+from numpy import *
+from timeit import timeit
+import pickle
+
+# Integrating many initial states: per-state loop versus one batched evaluation
+
+tend = 2*pi
+t=SX("t")
+
+x=SX("x") 
+dx=SX("dx")
+
+f=SXFunction({'NUM': ODE_NUM_IN, ODE_T: t, ODE_Y: [x,dx]},[[dx,-x]])
+f.init()
+
+ts = linspace(0,tend,50)
+
+F = RK4(f,ts,folded=True)
+F.init()
+
+def perState(X):
+  for k in range(X.shape[1]):
+    F.input(0).set(X[:,k])
+    F.evaluate()
+
+nbatch=array([1,10,100,1000])
+tl=zeros(nbatch.shape)
+tb=zeros(nbatch.shape)
+tc=zeros(nbatch.shape)
+
+for i in range(len(nbatch)):
+  print "nbatch = ", nbatch[i]
+  
+  X = random.random((2,nbatch[i]))
+  
+  tl[i]=timeit(stmt="perState(X)", setup="from __main__ import perState,X",number=10)/10
+  
+  tc[i]=timeit(stmt="Batched(RK4,f,ts,nbatch=nbatch[i],folded=True).init()", setup="from __main__ import Batched,RK4,f,ts,nbatch,i",number=1)
+  Fb = Batched(RK4,f,ts,nbatch=nbatch[i],folded=True)
+  Fb.init()
+  
+  tb[i]=timeit(stmt="evaluateBatch(Fb,X)", setup="from __main__ import evaluateBatch,Fb,X",number=10)/10
+  
+  print "loop: %f [s], batched: %f [s], batched construction: %f [s]" % (tl[i],tb[i],tc[i])
+
+pickle.dump({'nbatch':nbatch,'tl':tl,'tb':tb,'tc':tc},file('batchtest.dat','w'))
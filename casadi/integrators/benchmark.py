@@ -0,0 +1,289 @@
+""" Benchmark runner for the integrators
+
+A benchmark is a list of declarative cases, e.g.
+
+  {'name': 'RK4', 'method': RK4, 'tableau': RK4_TABLEAU, 'steps': [10,100]}
+  {'name': 'DOPRI5(4)', 'method': DormandPrince, 'tol': [1e-4,1e-8]}
+
+Fixed-step cases may set 'folded': True (an MXFunction calling a single
+SX step, which still has one call node per step) or 'stepped': True (a
+SteppedIntegrator, a numeric loop over the step, differentiated with
+ForwardSensitivity). Cases with 'implicit': True run an
+ImplicitFixedStepIntegrator. Each case is run for every metric in 'metrics' that
+applies to it:
+
+  construction, evaluate, jacobian, jacobian_ad, sensitivity : time [s]
+  jacobian_memory, sensitivity_memory : peak memory of building and
+    evaluating the flow map Jacobian [kB]
+  nodes, jacobian_nodes : SX node count (not reported for folded cases,
+    whose MX graph is not an SX graph)
+  error : absolute error of the final state (its first component is 1)
+  evals : number of RHS evaluations
+  factorizations : number of LU factorizations (implicit cases)
+
+The right hand side defaults to the harmonic oscillator; a script may
+pass its own f and x0 to main().
+
+Results are written as JSON (or CSV) together with machine metadata.
+The helpers shared with the other benchmarks live in casadi/benchtools.py:
+
+  PYTHONPATH=.. python integratortest.py [-o integratortest.json] [--repeat 5]
+  PYTHONPATH=.. python benchmark.py compare old.json new.json [--threshold 0.1]
+"""
+
+from casadi import *
+from integrators import *
+from numpy import *
+from benchtools import metadata, peakMemory
+import benchtools
+import numpy
+import timeit
+import csv
+import sys
+import argparse
+
+METRICS = ['construction','evaluate','jacobian','nodes','jacobian_nodes','error','evals']
+
+tend = 2*pi
+x0 = [1,0]
+
+def oscillator():
+  """ The harmonic oscillator x'' = -x; starting from x0 it returns to x0 at tend """
+  t=SX("t")
+
+  x=SX("x")
+  dx=SX("dx")
+
+  f=SXFunction({'NUM': ODE_NUM_IN, ODE_T: t, ODE_Y: [x,dx]},[[dx,-x]])
+  f.init()
+  return f
+
+def measure(fn,warmup=1,repeat=5,number=10):
+  """ Times fn, returning the best time per call and statistics over the repeats """
+  for i in range(warmup):
+    fn()
+  ts = array(timeit.Timer(fn).repeat(repeat=repeat,number=number))/number
+  return {'value': ts.min(), 'median': median(ts), 'stddev': ts.std(), 'repeat': repeat, 'number': number}
+
+def _row(case,metric,value,steps=None,tol=None):
+  if not(isinstance(value,dict)):
+    value = {'value': value}
+  row = {'case': case['name'], 'steps': steps, 'tol': tol, 'metric': metric}
+  row.update(value)
+  row['value'] = float(row['value'])
+  return row
+
+def runStepped(case,f,metrics,x0=x0,**timing):
+  """ The metrics of a SteppedIntegrator; its Jacobian is that of ForwardSensitivity """
+  rows = []
+  stages = case['tableau']['b'].numel()
+  for Nsteps in case['steps']:
+    Nsteps = int(Nsteps)
+    print "%s: Nsteps = %d" % (case['name'],Nsteps)
+    row = lambda metric,value: _row(case,metric,value,steps=Nsteps)
+
+    ts = linspace(0,tend,Nsteps)
+    build = lambda: SteppedIntegrator(f,ts,**case['tableau'])
+
+    if 'evals' in metrics:
+      rows.append(row('evals',(Nsteps-1)*stages))
+    if 'construction' in metrics:
+      rows.append(row('construction',measure(build,warmup=0,repeat=timing.get('repeat',5),number=1)))
+    F = build()
+    if 'nodes' in metrics:
+      rows.append(row('nodes',countNodes(F.step.outputSX())))
+    if 'evaluate' in metrics:
+      rows.append(row('evaluate',measure(lambda: F.integrate(x0),**timing)))
+    if 'error' in metrics:
+      rows.append(row('error',abs(F.integrate(x0)[0]-1)))
+    S = ForwardSensitivity(f,ts,**case['tableau'])
+    if 'jacobian_nodes' in metrics:
+      rows.append(row('jacobian_nodes',countNodes(S.step.outputSX())))
+    for metric in ['jacobian','sensitivity']:
+      if metric in metrics:
+        rows.append(row(metric,measure(lambda: S.evaluate(x0),**timing)))
+    for metric in ['jacobian_memory','sensitivity_memory']:
+      if metric in metrics:
+        rows.append(row(metric,peakMemory(lambda: ForwardSensitivity(f,ts,**case['tableau']).evaluate(x0))))
+  return rows
+
+def runImplicit(case,f,metrics,x0=x0,**timing):
+  """ The metrics of an ImplicitFixedStepIntegrator, counting its RHS evaluations and LU factorizations """
+  rows = []
+  for Nsteps in case['steps']:
+    Nsteps = int(Nsteps)
+    print "%s: Nsteps = %d" % (case['name'],Nsteps)
+    row = lambda metric,value: _row(case,metric,value,steps=Nsteps)
+
+    F = case['method'](f,linspace(0,tend,Nsteps))
+    if 'evaluate' in metrics:
+      rows.append(row('evaluate',measure(lambda: F.integrate(x0),**timing)))
+    y = F.integrate(x0)
+    if 'error' in metrics:
+      rows.append(row('error',abs(y[0]-1)))
+    if 'evals' in metrics:
+      rows.append(row('evals',F.nevals))
+    if 'factorizations' in metrics:
+      rows.append(row('factorizations',F.nfactor))
+  return rows
+
+def runFixed(case,f,metrics,x0=x0,**timing):
+  rows = []
+  method = case['method']
+  folded = case.get('folded',False)
+  stages = case['tableau']['b'].numel()
+  for Nsteps in case['steps']:
+    Nsteps = int(Nsteps)
+    print "%s: Nsteps = %d" % (case['name'],Nsteps)
+    row = lambda metric,value: _row(case,metric,value,steps=Nsteps)
+
+    ts = linspace(0,tend,Nsteps)
+    build = lambda: method(f,ts,folded=folded)
+
+    if 'evals' in metrics:
+      rows.append(row('evals',(Nsteps-1)*stages))
+
+    # Metrics that need the unrolled integrator itself
+    if set(metrics) & set(['construction','nodes','evaluate','error','jacobian','jacobian_nodes','jacobian_ad','jacobian_memory']):
+      F = build()
+      if 'construction' in metrics:
+        rows.append(row('construction',measure(build,warmup=0,repeat=timing.get('repeat',5),number=1)))
+
+      F.init()
+      F.input(0).set(x0)
+      if 'nodes' in metrics and not folded:
+        rows.append(row('nodes',countNodes(F.outputSX())))
+      if 'evaluate' in metrics:
+        rows.append(row('evaluate',measure(F.evaluate,**timing)))
+      F.evaluate()
+      if 'error' in metrics:
+        rows.append(row('error',abs(F.output()[0]-1)))
+
+      if 'jacobian' in metrics or 'jacobian_nodes' in metrics:
+        J=F.jacobian() # symbolic jacobian
+        J.init()
+        J.input(0).set(x0)
+        if 'jacobian_nodes' in metrics and isinstance(J,SXFunction):
+          rows.append(row('jacobian_nodes',countNodes(J.outputSX())))
+        if 'jacobian' in metrics:
+          rows.append(row('jacobian',measure(J.evaluate,**timing)))
+      if 'jacobian_ad' in metrics:
+        J=Jacobian(F)
+        J.init()
+        J.input(0).set(x0)
+        rows.append(row('jacobian_ad',measure(J.evaluate,**timing)))
+      if 'jacobian_memory' in metrics:
+        def jacobian():
+          F = build()
+          F.init()
+          J = F.jacobian()
+          J.init()
+          J.input(0).set(x0)
+          J.evaluate()
+        rows.append(row('jacobian_memory',peakMemory(jacobian)))
+
+    if 'sensitivity' in metrics:
+      S = ForwardSensitivity(f,ts,**case['tableau'])
+      rows.append(row('sensitivity',measure(lambda: S.evaluate(x0),**timing)))
+    if 'sensitivity_memory' in metrics:
+      rows.append(row('sensitivity_memory',peakMemory(lambda: ForwardSensitivity(f,ts,**case['tableau']).evaluate(x0))))
+  return rows
+
+def runAdaptive(case,f,metrics,x0=x0,**timing):
+  rows = []
+  for tol in case['tol']:
+    print "%s: tol = %g" % (case['name'],tol)
+    row = lambda metric,value: _row(case,metric,value,tol=tol)
+
+    F = case['method'](f,[0,tend],reltol=tol,abstol=tol)
+    if 'evaluate' in metrics:
+      rows.append(row('evaluate',measure(lambda: F.integrate(x0),**timing)))
+    y = F.integrate(x0)
+    if 'error' in metrics:
+      rows.append(row('error',abs(y[0]-1)))
+    if 'evals' in metrics:
+      rows.append(row('evals',F.nevals))
+  return rows
+
+def run(cases,metrics=METRICS,f=None,x0=x0,**timing):
+  if f is None:
+    f = oscillator()
+  rows = []
+  for case in cases:
+    m = case.get('metrics',metrics)
+    if 'tol' in case:
+      rows+= runAdaptive(case,f,m,x0,**timing)
+    elif case.get('implicit',False):
+      rows+= runImplicit(case,f,m,x0,**timing)
+    elif case.get('stepped',False):
+      rows+= runStepped(case,f,m,x0,**timing)
+    else:
+      rows+= runFixed(case,f,m,x0,**timing)
+  return {'metadata': metadata(), 'results': rows}
+
+COLUMNS = ['case','steps','tol','metric','value','median','stddev','repeat','number']
+
+def save(results,filename,format=None):
+  if format is None:
+    format = 'csv' if filename.endswith('.csv') else 'json'
+  if format=='json':
+    benchtools.save(results,filename)
+  else:
+    f = file(filename,'w')
+    for k,v in sorted(results['metadata'].items()):
+      f.write("# %s: %s\n" % (k,v))
+    w = csv.DictWriter(f,COLUMNS)
+    w.writerow(dict(zip(COLUMNS,COLUMNS)))
+    for r in results['results']:
+      w.writerow(r)
+    f.close()
+
+def load(filename):
+  return benchtools.load(filename)
+
+def series(results,case,metric,x='steps'):
+  """ Returns the arrays (x, value) of one metric of one case """
+  rows = [r for r in results['results'] if r['case']==case and r['metric']==metric]
+  return array([r[x] for r in rows],dtype=float), array([r['value'] for r in rows])
+
+def caseNames(results):
+  names = []
+  for r in results['results']:
+    if r['case'] not in names:
+      names.append(r['case'])
+  return names
+
+def compare(old,new,threshold=0.1):
+  """ Returns the rows of new that are worse than old by more than threshold (relative) """
+  return benchtools.compare(old,new,lambda r: (r['case'],r['steps'],r['tol'],r['metric']),threshold)
+
+def main(cases=None,output='benchmark.json',argv=None,f=None,x0=x0):
+  parser = argparse.ArgumentParser(description="Integrator benchmarks")
+  if cases is None:
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('compare',help="flag regressions between two result files")
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold',type=float,default=0.1)
+  else:
+    parser.add_argument('-o','--output',default=output)
+    parser.add_argument('--format',choices=['json','csv'])
+    parser.add_argument('--warmup',type=int,default=1)
+    parser.add_argument('--repeat',type=int,default=5)
+    parser.add_argument('--number',type=int,default=10)
+  args = parser.parse_args(argv)
+
+  if cases is None:
+    old = load(args.old)
+    new = load(args.new)
+    regressions = compare(old,new,args.threshold)
+    for r,before in regressions:
+      print "REGRESSION %s steps=%s tol=%s %s: %g -> %g (%+.0f%%)" % (r['case'],r['steps'],r['tol'],r['metric'],before,r['value'],100*(r['value']/before-1))
+    print "%d regressions" % len(regressions)
+    sys.exit(1 if regressions else 0)
+
+  results = run(cases,f=f,x0=x0,warmup=args.warmup,repeat=args.repeat,number=args.number)
+  save(results,args.output,args.format)
+
+if __name__ == "__main__":
+  main()
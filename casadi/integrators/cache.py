@@ -0,0 +1,119 @@
+""" On-disk cache of fixed-step integrators
+
+An integrator is identified by the expressions of its right hand side,
+its tableau and its time grid. The built SXFunction is stored as
+generated C code compiled into a shared library, and reloaded with
+ExternalFunction, so a warm cache skips graph construction entirely.
+
+The cache is evicted least-recently-used first once it grows beyond
+max_bytes.
+"""
+
+from casadi import *
+from numpy import *
+from integrators import ExplicitFixedStepIntegrator
+import hashlib
+import os
+import subprocess
+
+def integratorKey(f,times,tableau):
+  """ A content hash of the RHS function f, the tableau and the time grid """
+  h = hashlib.sha1()
+  for i in range(f.getNumInputs()):
+    h.update(str(f.inputSX(i)))
+  for i in range(f.getNumOutputs()):
+    h.update(str(f.outputSX(i)))
+  for k in sorted(tableau.keys()):
+    h.update(k)
+    h.update(DMatrix(tableau[k]).toArray().tostring())
+  h.update(array(DMatrix(times).toArray(),dtype=float).tostring())
+  return h.hexdigest()
+
+class IntegratorCache:
+  def __init__(self,directory=os.path.expanduser("~/.cache/integrators"),max_bytes=100e6,compiler="gcc"):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.compiler = compiler
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+
+  def path(self,key):
+    return os.path.join(self.directory,key+".so")
+
+  def __call__(self,f,times,tableau):
+    """ Returns an (uninitialized) integrator for f over times with the given tableau """
+    key = integratorKey(f,times,tableau)
+    so = self.path(key)
+    if os.path.exists(so):
+      # Mark as recently used
+      os.utime(so,None)
+    else:
+      F = ExplicitFixedStepIntegrator(f,times,**tableau)
+      F.init()
+      self.store(F,key)
+    return ExternalFunction(so)
+
+  def store(self,F,key):
+    """ Compiles the SXFunction F into the cache under key """
+    so = self.path(key)
+    # Per-process names, so concurrent misses on the same key do not collide
+    c = os.path.join(self.directory,key+".%d.c" % os.getpid())
+    tmp = so + ".%d" % os.getpid()
+    try:
+      F.generateCode(c)
+      subprocess.check_call([self.compiler,"-shared","-fPIC","-O2","-o",tmp,c])
+      os.rename(tmp,so)
+    finally:
+      for e in [c,tmp]:
+        if os.path.exists(e):
+          os.remove(e)
+    self.evict()
+
+  def entries(self):
+    return [os.path.join(self.directory,e) for e in os.listdir(self.directory) if e.endswith(".so")]
+
+  def size(self):
+    return array([os.path.getsize(e) for e in self.entries()]).sum()
+
+  def evict(self):
+    """ Removes the least recently used entries until the cache fits in max_bytes """
+    entries = self.entries()
+    entries.sort(key=os.path.getmtime)
+    total = self.size()
+    # Always keep the most recent entry, even if it alone exceeds max_bytes
+    for e in entries[:-1]:
+      if total <= self.max_bytes:
+        break
+      total-= os.path.getsize(e)
+      os.remove(e)
+
+  def clear(self):
+    for e in self.entries():
+      os.remove(e)
+
+if __name__ == "__main__":
+  from integrators import RK4_TABLEAU
+  from time import time
+
+  t=SX("t")
+
+  x=SX("x")
+  dx=SX("dx")
+
+  f=SXFunction({'NUM': ODE_NUM_IN, ODE_T: t, ODE_Y: [x,dx]},[[dx,-x]])
+  f.init()
+
+  ts = linspace(0,2*pi,1000)
+
+  cache = IntegratorCache()
+  cache.clear()
+
+  for name in ["cold","warm"]:
+    t0=time()
+    F = cache(f,ts,RK4_TABLEAU)
+    F.init()
+    print "%s cache: %f [s]" % (name,time()-t0)
+
+  F.input(0).set([1,0])
+  F.evaluate()
+  print F.output()
@@ -1,7 +1,55 @@
 from casadi import *
 from numpy import *
+from scipy.linalg import lu_factor, lu_solve
 import casadi
-def ExplicitFixedStepIntegrator(f,times=None,a=None,b=None,c=None):
+def _toSX(a):
+  return casadi.reshape(SXMatrix(a),a.shape[0],a.shape[1])
+
+def _checkTableau(a,b,c):
+  s=b.numel()
+  assert(a.size1()==s-1)
+  assert(a.size2()==s-1)
+  assert(c.numel()==s)
+  
+  if s>1:
+    for lhs,rhs in zip(c[1:,0],casadi.sum(a,1)):
+     pass
+     #assert(lhs==rhs)
+  return s
+
+def _explicitStages(f,t,h,y,p,a,c):
+  """ Returns the (N x s) matrix of stage derivatives of one step of size h """
+  s = c.numel()
+  ks = SXMatrix(y.numel(),s)
+  for i in range(s):
+    if i>0:
+      x = y + casadi.dot(ks[:,:i],a[i-1,:i].T)*h
+    else:
+      x = y
+    ks[:,i] = f.eval({ODE_T: t+c[i,0]*h, ODE_Y: x, ODE_P: p})[0]
+  return ks
+
+def ExplicitStep(f,a=None,b=None,c=None):
+  """ A single step of an explicit Runge-Kutta method
+  
+  Returns an SXFunction (t,h,y,p) -> y_next
+  
+  The size of its expression graph does not depend on the time grid.
+  """
+  a     = _toSX(a)
+  b     = _toSX(b)
+  c     = _toSX(c)
+  _checkTableau(a,b,c)
+  
+  t = SX("t")
+  h = SX("h")
+  y = f.inputSX(ODE_Y)
+  p = f.inputSX(ODE_P)
+  
+  ks = _explicitStages(f,t,h,y,p,a,c)
+  return SXFunction([t,h,y,p],[y + casadi.dot(ks,b)*h])
+  
+def ExplicitFixedStepIntegrator(f,times=None,a=None,b=None,c=None,folded=False):
   """ a,b,c are the tableau coefficients
   
   If s is the number of stages, then we have:
@@ -11,67 +59,433 @@ def ExplicitFixedStepIntegrator(f,times=None,a=None,b=None,c=None):
   
   times may be DVector or SXVector
   
+  folded: if True, the step is built once as an SXFunction and called
+  for every interval of times from an MXFunction. The SX graph then has
+  the size of a single step, but the MX graph holds one call node per
+  interval, so construction is still O(len(times)); see SteppedIntegrator
+  for a construction cost independent of the grid.
+  times must be numeric in this case.
+  
   """
   
   if not(isinstance(times,DMatrix)):
     times = DMatrix(times)
     
-  
-  def toSX(a):
-    return casadi.reshape(SXMatrix(a),a.shape[0],a.shape[1])
+  if folded:
+    step = ExplicitStep(f,a,b,c)
+    step.init()
     
+    ts = times.toArray().ravel()
+    p = f.inputSX(ODE_P)
+    x_init = MX("x0",f.inputSX(ODE_Y).numel(),1)
+    p_ = MX("p",p.size1(),p.size2())
     
-  times = toSX(times)
-  a     = toSX(a)
-  b     = toSX(b)
-  c     = toSX(c)
+    y = x_init
+    for k in range(len(ts)-1):
+      y = step.call([MX(float(ts[k])),MX(float(ts[k+1]-ts[k])),y,p_])[0]
+      
+    return MXFunction([x_init,p_],[y])
+    
+  times = _toSX(times)
+  a     = _toSX(a)
+  b     = _toSX(b)
+  c     = _toSX(c)
   
   x_init = f.inputSX(ODE_Y)
-  N = x_init.numel()
   p = f.inputSX(ODE_P)
   
-  s=b.numel()
-  assert(a.size1()==s-1)
-  assert(a.size2()==s-1)
-  assert(c.numel()==s)
-  
-  if s>1:
-    for lhs,rhs in zip(c[1:,0],casadi.sum(a,1)):
-     pass
-     #assert(lhs==rhs)
+  _checkTableau(a,b,c)
     
-  ks = SXMatrix(N,s)
   y = x_init
   
   for k in range(len(times)-1):
     t = times[k]
     h = times[k+1]-times[k]
-    for i in range(s):
-      if i>0:
-        x = y + casadi.dot(ks[:,:i],a[i-1,:i].T)*h
-      else:
-        x = y
-      ks[:,i] = f.eval({ODE_T: t+c[i,0]*h, ODE_Y: x, ODE_P: p})[0]
+    ks = _explicitStages(f,t,h,y,p,a,c)
     y+= casadi.dot(ks,b)*h
     
   return SXFunction([x_init,p],[y])
+
+EULER_TABLEAU = {'a': DMatrix(), 'b': DMatrix([1]), 'c': DMatrix([0])}
+
+RK2_TABLEAU = {
+  'a': DMatrix(array([[2.0/3]])),
+  'b': DMatrix([1.0/4,3.0/4]),
+  'c': DMatrix([0,2.0/3])}
+
+RK4_TABLEAU = {
+  'a': DMatrix(array([[0.5,0,0],[0,0.5,0],[0,0,1]])),
+  'b': DMatrix([1.0/6,1.0/3,1.0/3,1.0/6]),
+  'c': DMatrix([0,0.5,0.5,1])}
   
-def Euler(f,times=None):
-  return ExplicitFixedStepIntegrator(f,times=times,a=DMatrix(),b=DMatrix([1]),c=DMatrix([0]))
+def Euler(f,times=None,folded=False):
+  return ExplicitFixedStepIntegrator(f,times=times,folded=folded,**EULER_TABLEAU)
   
   
-def RK4(f,times=None):
-  return ExplicitFixedStepIntegrator(f,times=times,
-      a=DMatrix(array([[0.5,0,0],[0,0.5,0],[0,0,1]])),
-      b=DMatrix([1.0/6,1.0/3,1.0/3,1.0/6]),
-      c=DMatrix([0,0.5,0.5,1]))
+def RK4(f,times=None,folded=False):
+  return ExplicitFixedStepIntegrator(f,times=times,folded=folded,**RK4_TABLEAU)
       
-def RK2(f,times=None):
-  return ExplicitFixedStepIntegrator(f,times=times,
-      a=DMatrix(array([[2.0/3]])),
-      b=DMatrix([1.0/4,3.0/4]),
-      c=DMatrix([0,2.0/3]))
+def RK2(f,times=None,folded=False):
+  return ExplicitFixedStepIntegrator(f,times=times,folded=folded,**RK2_TABLEAU)
       
+def SensitivityStep(f,a=None,b=None,c=None):
+  """ A single explicit Runge-Kutta step together with its derivatives
+  
+  Returns an SXFunction (t,h,y,p) -> (y_next, d y_next/d y, d y_next/d p)
+  """
+  a     = _toSX(a)
+  b     = _toSX(b)
+  c     = _toSX(c)
+  _checkTableau(a,b,c)
+  
+  t = SX("t")
+  h = SX("h")
+  y = f.inputSX(ODE_Y)
+  p = f.inputSX(ODE_P)
+  
+  ks = _explicitStages(f,t,h,y,p,a,c)
+  y_next = y + casadi.dot(ks,b)*h
+  return SXFunction([t,h,y,p],[y_next,jacobian(y_next,y),jacobian(y_next,p)])
+  
+class ForwardSensitivity:
+  """ Flow map of a fixed-step integrator with its Jacobians
+  
+  Instead of differentiating the unrolled graph, the variational
+  equations are propagated numerically alongside the state:
+  
+    S_{k+1} = A_k S_k,  Sp_{k+1} = A_k Sp_k + B_k
+    
+  with A_k, B_k the derivatives of step k w.r.t. y and p. The cost is
+  O(steps x states^2) and the memory does not grow with the number of steps.
+  """
+  def __init__(self,f,times=None,**tableau):
+    self.step = SensitivityStep(f,**tableau)
+    self.step.init()
+    self.times = array(DMatrix(times).toArray()).ravel()
+    self.N = f.inputSX(ODE_Y).numel()
+    self.np = f.inputSX(ODE_P).numel()
+    
+  def evaluate(self,x0,p=[]):
+    """ Returns the final state y, dy/dx0 and dy/dp """
+    y = array(x0,dtype=float).ravel()
+    S = eye(self.N)
+    Sp = zeros((self.N,self.np))
+    for k in range(len(self.times)-1):
+      self.step.input(0).set(self.times[k])
+      self.step.input(1).set(self.times[k+1]-self.times[k])
+      self.step.input(2).set(y)
+      if self.np>0:
+        self.step.input(3).set(p)
+      self.step.evaluate()
+      y = self.step.output(0).toArray().ravel()
+      A = self.step.output(1).toArray()
+      S = dot(A,S)
+      if self.np>0:
+        Sp = dot(A,Sp) + self.step.output(2).toArray()
+    return y, S, Sp
+    
+class SteppedIntegrator:
+  """ Fixed-step explicit integration by a numeric loop over a single step
+  
+  Only the step is a CasADi function (ExplicitStep), so the expression
+  graph, and the time to build it, do not depend on the time grid. The
+  Jacobian of the flow map is obtained with ForwardSensitivity.
+  """
+  def __init__(self,f,times=None,**tableau):
+    self.step = ExplicitStep(f,**tableau)
+    self.step.init()
+    self.times = array(DMatrix(times).toArray()).ravel()
+    self.np = f.inputSX(ODE_P).numel()
+    
+  def integrate(self,x0,p=[]):
+    """ Integrate from x0 over times, returning the state at times[-1] """
+    y = array(x0,dtype=float).ravel()
+    for k in range(len(self.times)-1):
+      self.step.input(0).set(self.times[k])
+      self.step.input(1).set(self.times[k+1]-self.times[k])
+      self.step.input(2).set(y)
+      if self.np>0:
+        self.step.input(3).set(p)
+      self.step.evaluate()
+      y = self.step.output().toArray().ravel()
+    return y
+    
+def EmbeddedStep(f,a=None,b=None,bhat=None,c=None):
+  """ A single step of an embedded explicit Runge-Kutta pair
+  
+  b are the weights of the propagated solution, bhat those of the
+  embedded one; both share the stages given by a and c.
+  
+  Returns an SXFunction (t,h,y,p) -> (y_next, error estimate)
+  """
+  a     = _toSX(a)
+  b     = _toSX(b)
+  bhat  = _toSX(bhat)
+  c     = _toSX(c)
+  _checkTableau(a,b,c)
+  assert(bhat.numel()==b.numel())
+  
+  t = SX("t")
+  h = SX("h")
+  y = f.inputSX(ODE_Y)
+  p = f.inputSX(ODE_P)
+  
+  ks = _explicitStages(f,t,h,y,p,a,c)
+  return SXFunction([t,h,y,p],[y + casadi.dot(ks,b)*h, casadi.dot(ks,b-bhat)*h])
+
+DOPRI5_TABLEAU = {
+  'a': DMatrix(array([
+         [1.0/5,0,0,0,0,0],
+         [3.0/40,9.0/40,0,0,0,0],
+         [44.0/45,-56.0/15,32.0/9,0,0,0],
+         [19372.0/6561,-25360.0/2187,64448.0/6561,-212.0/729,0,0],
+         [9017.0/3168,-355.0/33,46732.0/5247,49.0/176,-5103.0/18656,0],
+         [35.0/384,0,500.0/1113,125.0/192,-2187.0/6784,11.0/84]])),
+  'b': DMatrix([35.0/384,0,500.0/1113,125.0/192,-2187.0/6784,11.0/84,0]),
+  'bhat': DMatrix([5179.0/57600,0,7571.0/16695,393.0/640,-92097.0/339200,187.0/2100,1.0/40]),
+  'c': DMatrix([0,1.0/5,3.0/10,4.0/5,8.0/9,1,1])}
+
+BS32_TABLEAU = {
+  'a': DMatrix(array([[1.0/2,0,0],[0,3.0/4,0],[2.0/9,1.0/3,4.0/9]])),
+  'b': DMatrix([2.0/9,1.0/3,4.0/9,0]),
+  'bhat': DMatrix([7.0/24,1.0/4,1.0/3,1.0/8]),
+  'c': DMatrix([0,1.0/2,3.0/4,1])}
+
+class AdaptiveIntegrator:
+  """ Error-controlled integration with an embedded Runge-Kutta pair
+  
+  The step function is built once; the step sizes are chosen
+  numerically while integrating, so this is not an SXFunction.
+  
+  order is the order of the embedded (lower order) solution.
+  
+  After integrate(), nsteps, nrejected and nevals (the number of RHS
+  evaluations) describe the cost of the last run.
+  """
+  def __init__(self,f,times=None,order=None,reltol=1e-6,abstol=1e-8,hmin=1e-12,max_steps=100000,**tableau):
+    self.step = EmbeddedStep(f,**tableau)
+    self.step.init()
+    self.stages = tableau['b'].numel()
+    self.times = array(DMatrix(times).toArray()).ravel()
+    self.order = order
+    self.reltol = reltol
+    self.abstol = abstol
+    self.hmin = hmin
+    self.max_steps = max_steps
+    self.np = f.inputSX(ODE_P).numel()
+    
+  def _step(self,t,h,y,p):
+    self.step.input(0).set(t)
+    self.step.input(1).set(h)
+    self.step.input(2).set(y)
+    if self.np>0:
+      self.step.input(3).set(p)
+    self.step.evaluate()
+    return self.step.output(0).toArray().ravel(), self.step.output(1).toArray().ravel()
+    
+  def integrate(self,x0,p=[]):
+    """ Integrate from x0 over times, returning the state at times[-1] """
+    y = array(x0,dtype=float).ravel()
+    self.nsteps = self.nrejected = 0
+    h = None
+    for k in range(len(self.times)-1):
+      t, tend = self.times[k], self.times[k+1]
+      if h is None:
+        h = (tend-t)/100
+      while t < tend:
+        if self.nsteps + self.nrejected >= self.max_steps:
+          raise Exception("AdaptiveIntegrator: max_steps exceeded at t=%g" % t)
+        h = minimum(h,tend-t)
+        y_new, err = self._step(t,h,y,p)
+        scale = self.abstol + self.reltol*maximum(abs(y),abs(y_new))
+        e = sqrt(mean((err/scale)**2))
+        if e <= 1 or h <= self.hmin:
+          t+= h
+          y = y_new
+          self.nsteps+= 1
+        else:
+          self.nrejected+= 1
+        # Standard controller with safety factor, limited growth/shrinkage
+        if e == 0:
+          h*= 5
+        else:
+          h*= clip(0.9*e**(-1.0/(self.order+1)),0.2,5)
+        h = maximum(h,self.hmin)
+    self.nevals = self.stages*(self.nsteps+self.nrejected)
+    return y
+    
+def DormandPrince(f,times=None,reltol=1e-6,abstol=1e-8):
+  return AdaptiveIntegrator(f,times=times,order=4,reltol=reltol,abstol=abstol,**DOPRI5_TABLEAU)
+  
+def BogackiShampine(f,times=None,reltol=1e-6,abstol=1e-8):
+  return AdaptiveIntegrator(f,times=times,order=2,reltol=reltol,abstol=abstol,**BS32_TABLEAU)
+  
+def BatchedRHS(f,nbatch):
+  """ Stacks nbatch independent copies of the ODE right hand side f
+  
+  The state of the returned function is an (N x nbatch) matrix of
+  states, stacked column by column into an (N*nbatch) vector.
+  The parameters p are shared by all copies.
+  """
+  t = f.inputSX(ODE_T)
+  y = f.inputSX(ODE_Y)
+  p = f.inputSX(ODE_P)
+  N = y.numel()
+  
+  Y = symbolic("Y",N*nbatch,1)
+  rhs = vertcat([f.eval({ODE_T: t, ODE_Y: Y[k*N:(k+1)*N,0], ODE_P: p})[0] for k in range(nbatch)])
+  
+  fb = SXFunction({'NUM': ODE_NUM_IN, ODE_T: t, ODE_Y: Y, ODE_P: p},[rhs])
+  fb.init()
+  return fb
+  
+def Batched(method,f,times=None,nbatch=1,**kwargs):
+  """ An integrator (e.g. method=RK4) that integrates nbatch initial states at once
+  
+  Use evaluateBatch to feed it an (N x nbatch) array of states.
+  """
+  return method(BatchedRHS(f,nbatch),times,**kwargs)
+  
+def evaluateBatch(F,X,p=None):
+  """ Evaluates a Batched integrator F for the (N x nbatch) initial states X
+  
+  Returns the (N x nbatch) array of final states.
+  """
+  X = array(X,dtype=float)
+  F.input(0).set(X.ravel(order='F'))
+  if p is not None:
+    F.input(1).set(p)
+  F.evaluate()
+  return F.output().toArray().reshape(X.shape,order='F')
+  
+class ImplicitFixedStepIntegrator:
+  """ Fixed-step implicit Runge-Kutta integration for stiff right hand sides
+  
+  Unlike the explicit methods, a is a full (s x s) matrix and b,c are (s x 1).
+  
+  The stage equations are solved with a simplified Newton method. The
+  iteration matrix I - h kron(a, df/dy) is LU-factorized once and
+  reused across steps; it is only refactorized when the step size
+  changes or Newton converges slowly.
+  
+  After integrate(), nsteps, nevals (RHS evaluations), njac (Jacobian
+  evaluations) and nfactor (LU factorizations) describe the cost of the
+  last run.
+  """
+  def __init__(self,f,times=None,a=None,b=None,c=None,tol=1e-10,max_iter=10):
+    self.f = f
+    self.J = f.jacobian(ODE_Y,0)
+    self.J.init()
+    self.a = array(DMatrix(a).toArray())
+    self.b = array(DMatrix(b).toArray()).ravel()
+    self.c = array(DMatrix(c).toArray()).ravel()
+    self.s = len(self.b)
+    assert(self.a.shape==(self.s,self.s))
+    assert(len(self.c)==self.s)
+    # Stiffly accurate methods (e.g. Radau IIA) take the last stage as solution
+    self.stiffly_accurate = allclose(self.a[-1,:],self.b)
+    if not self.stiffly_accurate:
+      self.d = kron(linalg.solve(self.a.T,self.b),eye(f.inputSX(ODE_Y).numel()))
+    self.times = array(DMatrix(times).toArray()).ravel()
+    self.N = f.inputSX(ODE_Y).numel()
+    self.np = f.inputSX(ODE_P).numel()
+    self.tol = tol
+    self.max_iter = max_iter
+    
+  def _eval(self,fx,t,y,p):
+    fx.input(ODE_T).set(t)
+    fx.input(ODE_Y).set(y)
+    if self.np>0:
+      fx.input(ODE_P).set(p)
+    fx.evaluate()
+    return fx.output().toArray()
+    
+  def _stages(self,t,h,y,Z,p):
+    """ RHS evaluated at all stages, stacked into an (s*N) vector """
+    self.nevals+= self.s
+    N = self.N
+    return concatenate([self._eval(self.f,t+self.c[i]*h,y+Z[i*N:(i+1)*N],p).ravel() for i in range(self.s)])
+    
+  def _factorize(self,t,h,y,p):
+    self.njac+= 1
+    self.nfactor+= 1
+    Jy = self._eval(self.J,t,y,p)
+    return lu_factor(eye(self.s*self.N) - h*kron(self.a,Jy))
+    
+  def _newton(self,lu,t,h,y,p):
+    """ Returns the stage increments Z and the iteration count, or None """
+    aI = kron(self.a,eye(self.N))
+    Z = zeros(self.s*self.N)
+    for it in range(self.max_iter):
+      F = self._stages(t,h,y,Z,p)
+      dZ = lu_solve(lu,-(Z - h*dot(aI,F)))
+      Z+= dZ
+      self.nnewton+= 1
+      if linalg.norm(dZ) <= self.tol*(1+linalg.norm(Z)):
+        return Z, it+1
+    return None
+    
+  def integrate(self,x0,p=[]):
+    """ Integrate from x0 over times, returning the state at times[-1] """
+    y = array(x0,dtype=float).ravel()
+    self.nsteps = self.nevals = self.njac = self.nfactor = self.nnewton = 0
+    lu = None
+    h_lu = None
+    for k in range(len(self.times)-1):
+      t = self.times[k]
+      h = self.times[k+1]-self.times[k]
+      # Uniform grids differ in h only by rounding
+      if lu is None or abs(h-h_lu) > 1e-8*abs(h_lu):
+        lu, h_lu = self._factorize(t,h,y,p), h
+      r = self._newton(lu,t,h,y,p)
+      if r is None or r[1] > self.max_iter/2:
+        # Outdated iteration matrix: refresh it at the current state
+        lu = self._factorize(t,h,y,p)
+        if r is None:
+          r = self._newton(lu,t,h,y,p)
+          if r is None:
+            raise Exception("ImplicitFixedStepIntegrator: Newton failed to converge at t=%g" % t)
+      Z, _ = r
+      if self.stiffly_accurate:
+        y = y + Z[-self.N:]
+      else:
+        # Z = h (a x I) F, so h (b' x I) F = (b' inv(a) x I) Z needs no RHS evaluation
+        y = y + dot(self.d,Z)
+      self.nsteps+= 1
+    return y
+    
+BACKWARD_EULER_TABLEAU = {'a': DMatrix(array([[1.0]])), 'b': DMatrix([1]), 'c': DMatrix([1])}
+
+RADAU3_TABLEAU = {
+  'a': DMatrix(array([[5.0/12,-1.0/12],[3.0/4,1.0/4]])),
+  'b': DMatrix([3.0/4,1.0/4]),
+  'c': DMatrix([1.0/3,1])}
+
+RADAU5_TABLEAU = {
+  'a': DMatrix(array([
+         [(88-7*sqrt(6))/360,(296-169*sqrt(6))/1800,(-2+3*sqrt(6))/225],
+         [(296+169*sqrt(6))/1800,(88+7*sqrt(6))/360,(-2-3*sqrt(6))/225],
+         [(16-sqrt(6))/36,(16+sqrt(6))/36,1.0/9]])),
+  'b': DMatrix([(16-sqrt(6))/36,(16+sqrt(6))/36,1.0/9]),
+  'c': DMatrix([(4-sqrt(6))/10,(4+sqrt(6))/10,1])}
+
+GAUSS4_TABLEAU = {
+  'a': DMatrix(array([[1.0/4,1.0/4-sqrt(3)/6],[1.0/4+sqrt(3)/6,1.0/4]])),
+  'b': DMatrix([1.0/2,1.0/2]),
+  'c': DMatrix([1.0/2-sqrt(3)/6,1.0/2+sqrt(3)/6])}
+  
+def BackwardEuler(f,times=None):
+  return ImplicitFixedStepIntegrator(f,times=times,**BACKWARD_EULER_TABLEAU)
+  
+def RadauIIA3(f,times=None):
+  return ImplicitFixedStepIntegrator(f,times=times,**RADAU3_TABLEAU)
+  
+def RadauIIA5(f,times=None):
+  return ImplicitFixedStepIntegrator(f,times=times,**RADAU5_TABLEAU)
+  
+def GaussLegendre4(f,times=None):
+  return ImplicitFixedStepIntegrator(f,times=times,**GAUSS4_TABLEAU)
+  
 def debug(f,times=None,s=1):
   return ExplicitFixedStepIntegrator(f,times=times,a=symbolic("a",s-1,s-1),b=symbolic("b",s,1),c=symbolic("c",s,1))
   
@@ -117,3 +531,16 @@ if __name__ == "__main__":
   e.input(0).set([1,0])
   e.evaluate()
   print e.output()
+  
+  e = RK4(f,times,folded=True)
+  e.init()
+  e.input(0).set([1,0])
+  e.evaluate()
+  print e.output()
+  
+  e = Batched(RK4,f,times,nbatch=3)
+  e.init()
+  print evaluateBatch(e,[[1,0,2],[0,1,0]])
+  
+  e = DormandPrince(f,[0,pi/2])
+  print e.integrate([1,0]), e.nevals
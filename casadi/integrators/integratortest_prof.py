@@ -1,49 +1,15 @@
-from casadi import *
 from integrators import *
+from benchmark import main
 from numpy import *
-from pylab import *
-from timeit import timeit
-import pickle
 
-tend = 2*pi
-t=SX("t")
+# A single pass of evaluation and (non-symbolic) Jacobian, to be run under a profiler:
+#   python -m cProfile integratortest_prof.py
 
-x=SX("x") 
-dx=SX("dx")
+metrics = ['evaluate','jacobian_ad','error']
 
-f=SXFunction({'NUM': ODE_NUM_IN, ODE_T: t, ODE_Y: [x,dx]},[[dx,-x]])
-f.init()
+cases = [
+  {'name': 'Euler', 'method': Euler, 'tableau': EULER_TABLEAU, 'steps': floor(logspace(0.5,4,50)), 'metrics': metrics},
+  {'name': 'RK2', 'method': RK2, 'tableau': RK2_TABLEAU, 'steps': floor(logspace(0.5,3,50)), 'metrics': metrics},
+  {'name': 'RK4', 'method': RK4, 'tableau': RK4_TABLEAU, 'steps': floor(logspace(0.5,2,50)), 'metrics': metrics}]
 
-results=[]
-
-for method, name,N in [(Euler,"Euler",logspace(0.5,4,50)),(RK2,"RK2",logspace(0.5,3,50)),(RK4,"RK4",logspace(0.5,2,50))]:
-  N = floor(N)
-  x=tend/N
-  y=zeros(N.shape)
-  te=zeros(N.shape)
-  tj=zeros(N.shape)
-  tc=zeros(N.shape)
-    
-  for i in range(len(N)):
-    Nsteps = N[i]
-    print "Nsteps = ", Nsteps
-
-    ts = linspace(0,tend,Nsteps)
-
-    F = method(f,ts)
-
-    F.init()
-    F.input(0).set([1,0])
-    
-    F.evaluate()
-    
-    J=Jacobian(F)
-    J.init()
-    J.input(0).set([1,0])
-
-    J.evaluate()
-    
-    y[i]=abs(F.output()[0]-1)
-  
-  results.append({'method':method,'N':N,'x':x,'y':y,'name':name})
-  
+main(cases,output='integratortest_prof.json',argv=['--warmup','0','--repeat','1','--number','1'])
@@ -1,48 +1,37 @@
-from casadi import *
-from integrators import *
+from benchmark import load, series, caseNames
 from numpy import *
 from pylab import *
-from timeit import timeit
-import pickle
+import sys
 
-results = pickle.load(file('integratortest.dat','r'))
+results = load(sys.argv[1] if len(sys.argv)>1 else 'integratortest.json')
 
 figure()
-for r in results:
-  loglog(r['N'],r['y'],label=r['name'])
-xlabel('Number of steps')
+for name in caseNames(results):
+  _,evals = series(results,name,'evals')
+  _,error = series(results,name,'error')
+  loglog(evals,error,label=name)
+xlabel('Number of RHS evaluations')
 ylabel('Absolute error')
 legend()
 grid(True)
-title('Performance, number of steps')
-
-figure()
-for r in results:
-  loglog(r['N'],r['te'],label=r['name'])
-xlabel('Number of steps')
-ylabel('Execution time [s]')
-legend()
-grid(True)
-title('Execution time, evaluation')
-
-figure()
-for r in results:
-  loglog(r['N'],r['tj'],label=r['name'])
-xlabel('Number of steps')
-ylabel('Execution time [s]')
-legend()
-grid(True)
-title('Execution time, jacobian')
-
-figure()
-for r in results:
-  loglog(r['N'],r['tc'],label=r['name'])
-xlabel('Number of steps')
-ylabel('Execution time [s]')
-legend()
-grid(True)
-title('Construction time')
+title('Performance, RHS evaluations')
+
+for metric, ylab, tit in [
+    ('error','Absolute error','Performance, number of steps'),
+    ('evaluate','Execution time [s]','Execution time, evaluation'),
+    ('jacobian','Execution time [s]','Execution time, jacobian'),
+    ('construction','Execution time [s]','Construction time'),
+    ('nodes','Number of nodes','Size of the expression graph')]:
+  figure()
+  for name in caseNames(results):
+    N,y = series(results,name,metric)
+    # Adaptive integrators have no fixed step count
+    if len(N) and not(any(isnan(N))):
+      loglog(N,y,label=name)
+  xlabel('Number of steps')
+  ylabel(ylab)
+  legend()
+  grid(True)
+  title(tit)
 
 show()
-
-
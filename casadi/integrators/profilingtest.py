@@ -1,51 +1,12 @@
-from casadi import *
 from integrators import *
+from benchmark import main
 from numpy import *
-from pylab import *
-from timeit import timeit
-import pickle
 
-tend = 2*pi
-t=SX("t")
+metrics = ['construction','evaluate','jacobian','error']
 
-x=SX("x") 
-dx=SX("dx")
+cases = [
+  {'name': 'Euler', 'method': Euler, 'tableau': EULER_TABLEAU, 'steps': floor(logspace(0.5,4,50)), 'metrics': metrics},
+  {'name': 'RK2', 'method': RK2, 'tableau': RK2_TABLEAU, 'steps': floor(logspace(0.5,3,50)), 'metrics': metrics},
+  {'name': 'RK4', 'method': RK4, 'tableau': RK4_TABLEAU, 'steps': floor(logspace(0.5,2,50)), 'metrics': metrics}]
 
-f=SXFunction({'NUM': ODE_NUM_IN, ODE_T: t, ODE_Y: [x,dx]},[[dx,-x]])
-f.init()
-
-results=[]
-
-for method, name,N in [(Euler,"Euler",logspace(0.5,4,50)),(RK2,"RK2",logspace(0.5,3,50)),(RK4,"RK4",logspace(0.5,2,50))]:
-  N = floor(N)
-  x=tend/N
-  y=zeros(N.shape)
-  te=zeros(N.shape)
-  tj=zeros(N.shape)
-  tc=zeros(N.shape)
-    
-  for i in range(len(N)):
-    Nsteps = N[i]
-    print "Nsteps = ", Nsteps
-
-    ts = linspace(0,tend,Nsteps)
-
-    F = method(f,ts)
-    tc[i]=timeit(stmt="method(f,ts)", setup="from __main__ import f,ts,method",number=10)/10
-    
-    F.init()
-    F.input(0).set([1,0])
-    
-    te[i]=timeit(stmt="F.evaluate()", setup="from __main__ import F",number=100)/100
-    
-    J=F.jacobian() # symbolic jacobian
-    J.init()
-    J.input(0).set([1,0])
-
-    tj[i]=timeit(stmt="J.evaluate()", setup="from __main__ import J",number=100)/100
-    
-    y[i]=abs(F.output()[0]-1)
-  
-  results.append({'method':method,'N':N,'x':x,'y':y,'te':te,'tj':tj,'name':name,'tc':tc})
-  
-pickle.dump(results,file('integratortest.dat','w'))
+main(cases,output='profilingtest.json')
@@ -0,0 +1,14 @@
+from integrators import *
+from benchmark import main
+from numpy import *
+
+# Jacobian of the flow map: symbolic jacobian of the unrolled graph
+# versus forward propagation of the variational equations
+
+cases = [
+  {'name': 'RK4 symbolic', 'method': RK4, 'tableau': RK4_TABLEAU, 'steps': floor(logspace(0.5,3,20)),
+   'metrics': ['jacobian','jacobian_memory']},
+  {'name': 'RK4 forward sensitivity', 'method': RK4, 'tableau': RK4_TABLEAU, 'steps': floor(logspace(0.5,4,20)),
+   'metrics': ['sensitivity','sensitivity_memory']}]
+
+main(cases,output='sensitivitytest.json')
@@ -0,0 +1,27 @@
+from casadi import *
+from integrators import *
+from benchmark import main
+from numpy import *
+
+# A stiff scalar ODE with exact solution x(t) = cos(t):
+#   x' = -lam*(x - cos(t)) - sin(t)
+# Explicit methods are only stable for h < ~2.8/lam.
+
+lam = 1000
+t=SX("t")
+
+x=SX("x")
+
+f=SXFunction({'NUM': ODE_NUM_IN, ODE_T: t, ODE_Y: [x]},[[-lam*(x-cos(t))-sin(t)]])
+f.init()
+
+steps = [10,100,1000,5000]
+metrics = ['evaluate','error','evals','factorizations']
+
+cases = [
+  {'name': 'RK4', 'method': RK4, 'tableau': RK4_TABLEAU, 'folded': True, 'steps': steps, 'metrics': metrics},
+  {'name': 'BackwardEuler', 'method': BackwardEuler, 'implicit': True, 'steps': steps, 'metrics': metrics},
+  {'name': 'RadauIIA5', 'method': RadauIIA5, 'implicit': True, 'steps': steps, 'metrics': metrics},
+  {'name': 'GaussLegendre4', 'method': GaussLegendre4, 'implicit': True, 'steps': steps, 'metrics': metrics}]
+
+main(cases,output='stifftest.json',f=f,x0=[1])
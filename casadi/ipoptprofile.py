@@ -0,0 +1,152 @@
+""" Structured profiles of Ipopt solves
+
+instrument() makes Ipopt write its iteration log and timing statistics
+to a file; parseLog() turns that file into a dictionary with
+
+  iterations : per iteration objective, inf_pr (constraint violation),
+               inf_du, lg(mu), ||d||, alpha_du, alpha_pr, ls
+  timing     : every entry of Ipopt's timing statistics, e.g.
+               'Objective function', 'Lagrangian Hessian',
+               'LinearSystemFactorization' -> {'cpu','sys','wall'} [s]
+  counts     : number of evaluations of each callback
+  exit       : the exit message
+
+which save() writes as JSON. breakdown() condenses the timing into
+callbacks (f, g, grad, Hessian) versus the linear solver, to tell
+whether the evaluations or the KKT factorization dominate.
+
+  python ipoptprofile.py profile.json   # plots a saved profile
+"""
+
+import json
+import re
+
+TIMING_OPTIONS = {
+  "print_timing_statistics": "yes",
+  "file_print_level": 5}
+
+# Groups of Ipopt timing statistics
+CALLBACKS = ['Objective function','Objective function gradient',
+             'Equality constraints','Inequality constraints',
+             'Equality constraint Jacobian','Inequality constraint Jacobian',
+             'Lagrangian Hessian']
+LINEAR_SOLVER = ['LinearSystemSymbolicFactorization','LinearSystemFactorization','LinearSystemBackSolve']
+
+def instrument(solver,logfile="ipopt.out"):
+  """ Makes Ipopt write its profile to logfile
+
+  solver is either an IpoptSolver (before init) or the options dictionary
+  passed on as "nlp_solver_options"; the latter is returned updated.
+  """
+  options = dict(TIMING_OPTIONS)
+  options["output_file"] = logfile
+  if isinstance(solver,dict):
+    solver.update(options)
+    return solver
+  for k,v in options.items():
+    solver.setOption(k,v)
+  return solver
+
+def _float(s):
+  try:
+    return float(s)
+  except ValueError:
+    return None
+
+_timing = re.compile(r"^\s*(\S.*?)\.*:\s*([-+.\deE]+)(?:\s*\(sys:\s*([-+.\deE]+)\s*wall:\s*([-+.\deE]+)\))?\s*$")
+_count = re.compile(r"^Number of (.*) evaluations\s*=\s*(\d+)")
+_total = re.compile(r"^Total (?:CPU secs|seconds) in (.*?)\s*=\s*([-+.\deE]+)")
+
+def parseLog(logfile):
+  """ Parses an Ipopt output file into a profile dictionary """
+  profile = {'iterations': [], 'timing': {}, 'counts': {}, 'totals': {}, 'exit': None}
+  in_timing = False
+  for line in open(logfile,'r'):
+    tokens = line.split()
+    if line.startswith("Timing Statistics"):
+      in_timing = True
+      continue
+    if in_timing:
+      m = _timing.match(line)
+      if m:
+        name, cpu, sys_, wall = m.groups()
+        profile['timing'][name.strip()] = {'cpu': float(cpu), 'sys': _float(sys_ or ''), 'wall': _float(wall or '')}
+        continue
+    m = _count.match(line)
+    if m:
+      profile['counts'][m.group(1)] = int(m.group(2))
+      continue
+    m = _total.match(line)
+    if m:
+      profile['totals'][m.group(1)] = float(m.group(2))
+      continue
+    if line.startswith("EXIT:"):
+      profile['exit'] = line[5:].strip()
+      continue
+    # Iteration lines: iter objective inf_pr inf_du lg(mu) ||d|| lg(rg) alpha_du alpha_pr ls
+    if len(tokens)==10 and re.match(r"^\d+r?$",tokens[0]):
+      profile['iterations'].append({
+        'iter': int(tokens[0].rstrip('r')),
+        'restoration': tokens[0].endswith('r'),
+        'objective': _float(tokens[1]),
+        'inf_pr': _float(tokens[2]),
+        'inf_du': _float(tokens[3]),
+        'lg_mu': _float(tokens[4]),
+        'd_norm': _float(tokens[5]),
+        'lg_rg': _float(tokens[6]),
+        'alpha_du': _float(tokens[7]),
+        'alpha_pr': _float(tokens[8].rstrip('fFhHkKnNRwstTr')),
+        'ls': int(tokens[9])})
+  return profile
+
+def breakdown(profile):
+  """ CPU time [s] of the callbacks, the linear solver and the total """
+  timing = profile['timing']
+  cpu = lambda names: sum([timing[n]['cpu'] for n in names if n in timing])
+  b = dict((n,timing[n]['cpu']) for n in CALLBACKS+LINEAR_SOLVER if n in timing)
+  b['callbacks'] = cpu(CALLBACKS)
+  b['linear solver'] = cpu(LINEAR_SOLVER)
+  b['total'] = cpu(['OverallAlgorithm'])
+  b['other'] = b['total'] - b['callbacks'] - b['linear solver']
+  return b
+
+def summary(profile):
+  b = breakdown(profile)
+  lines = ["%d iterations, exit: %s" % (len(profile['iterations']),profile['exit'])]
+  for k in ['callbacks','linear solver','other','total']:
+    lines.append("%-15s %10.4f [s] (%5.1f%%)" % (k,b[k],100*b[k]/b['total'] if b['total'] else 0))
+  return "\n".join(lines)
+
+def save(profile,filename):
+  profile = dict(profile)
+  profile['breakdown'] = breakdown(profile)
+  json.dump(profile,open(filename,'w'),indent=1)
+
+def load(filename):
+  return json.load(open(filename,'r'))
+
+if __name__ == "__main__":
+  import sys
+  from pylab import *
+
+  profile = load(sys.argv[1])
+  it = profile['iterations']
+
+  figure()
+  subplot(2,1,1)
+  semilogy([i['iter'] for i in it],[abs(i['objective']) for i in it],'.-')
+  ylabel('|objective|')
+  subplot(2,1,2)
+  semilogy([i['iter'] for i in it],[i['inf_pr'] for i in it],'.-',label='inf_pr')
+  semilogy([i['iter'] for i in it],[i['inf_du'] for i in it],'.-',label='inf_du')
+  xlabel('iteration')
+  legend()
+
+  figure()
+  b = profile['breakdown']
+  names = [n for n in CALLBACKS+LINEAR_SOLVER if n in b]
+  barh(range(len(names)),[b[n] for n in names])
+  yticks(range(len(names)),names)
+  xlabel('CPU time [s]')
+  title("callbacks %.3f [s], linear solver %.3f [s], total %.3f [s]" % (b['callbacks'],b['linear solver'],b['total']))
+  show()
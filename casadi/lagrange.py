@@ -0,0 +1,82 @@
+""" Equations of motion from a Lagrangian
+
+For L = T - V in the generalized coordinates q, with velocities dq and
+generalized forces Q, the Euler-Lagrange equations
+
+  d/dt dL/ddq - dL/dq = Q
+
+are written as M(q,dq) ddq = b(q,dq) with
+
+  M = d^2 L/ddq^2,  b = dL/dq - d^2 L/(ddq dq) dq + Q
+
+and the accelerations are obtained with solve(M,b), instead of forming
+inv(M) symbolically, whose expressions grow quickly with the number of
+degrees of freedom.
+
+Derivations are cached in memory, keyed by the printed expressions of
+T, V, Q and the coordinates. The stored derivation keeps its free
+symbols; a cache hit substitutes every one of them (coordinates,
+parameters, controls) by the symbol of the same name in the call. If the
+names of the free symbols are not unique, nothing is cached.
+"""
+
+from casadi import *
+import hashlib
+
+_derivations = {}
+
+def _symbols(*expressions):
+  """ The free symbols of the expressions, by name; None if a name is not unique """
+  free = getSymbols(vertcat([SXMatrix(e) for e in expressions]))
+  symbols = dict((s.getName(),s) for s in free)
+  return symbols if len(symbols)==len(free) else None
+
+def _key(*expressions):
+  h = hashlib.sha1()
+  for e in expressions:
+    h.update(str(e))
+    h.update("|")
+  return h.hexdigest()
+
+class Lagrangian:
+  def __init__(self,T,V,q,dq,forcing=None,cache=True):
+    """ T, V: kinetic and potential energy; q, dq: coordinates and velocities; forcing: generalized forces """
+    q = SXMatrix(q)
+    dq = SXMatrix(dq)
+    n = q.size1()
+    forcing = SXMatrix(n,1,0) if forcing is None else SXMatrix(forcing)
+    self.q = q
+    self.dq = dq
+    self.v = vertcat([q,dq])
+
+    key = _key(T,V,q,dq,forcing)
+    symbols = _symbols(T,V,q,dq,forcing) if cache else None
+    if symbols is not None and key in _derivations and sorted(_derivations[key][0])==sorted(symbols):
+      old, M, b, ddq = _derivations[key]
+      names = sorted(symbols)
+      M, b, ddq = [substitute(e,SXMatrix([old[k] for k in names]),SXMatrix([symbols[k] for k in names])) for e in [M,b,ddq]]
+    else:
+      L = T - V
+      W = jacobian(L,dq).T
+      M = jacobian(W,dq)
+      b = jacobian(L,q).T - mul(jacobian(W,q),dq) + forcing
+      ddq = solve(M,b)
+      if symbols is not None:
+        _derivations[key] = (symbols,M,b,ddq)
+    self.M = M
+    self.b = b
+    self.ddq = ddq
+    self.rhs = vertcat([dq,ddq])
+
+  def implicit(self,ddq):
+    """ The residual M ddq - b of the equations of motion """
+    return mul(self.M,ddq) - self.b
+
+  def odeFunction(self,t,p=[]):
+    """ The initialized ODE right hand side, for CVodesIntegrator and friends """
+    f = SXFunction([t,self.v,p,[]],[self.rhs])
+    f.init()
+    return f
+
+def clearCache():
+  _derivations.clear()
@@ -0,0 +1,190 @@
+""" Benchmark suite for the time-optimal cart-pendulum of cartpendulum.py
+
+Every case solves the OCP for a list of grid sizes with its own Ipopt
+options, e.g.
+
+  {'name': 'exact', 'ns': [10,20,50], 'options': {}}
+  {'name': 'lbfgs', 'ns': [10,20,50], 'options': {'hessian_approximation': 'limited-memory'}}
+
+and records per grid size
+
+  iterations, wall [s], callbacks [s], linear_solver [s], T (the optimal end time)
+
+and the Ipopt exit message. Runs are headless. Results are stored as
+JSON, one file per commit, in ocpbenchmarks/, for regression comparison:
+
+  python ocpbenchmark.py run [--ns 10 20 50]
+  python ocpbenchmark.py compare <commit> <commit> [--threshold 0.1]
+"""
+
+from casadi import *
+import numpy as n
+import ipoptprofile
+from lagrange import Lagrangian
+from time import time
+import tempfile
+import argparse
+import benchtools
+import sys
+import os
+
+CASES = [
+  {'name': 'exact', 'options': {}},
+  {'name': 'lbfgs', 'options': {'hessian_approximation': 'limited-memory'}},
+  {'name': 'adaptive mu', 'options': {'mu_strategy': 'adaptive'}}]
+
+NS = [10,20,50]
+
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)),"ocpbenchmarks")
+
+def timeOptimalDynamics():
+  """ The cart-pendulum in reduced time tau in [0,1]: states [x,theta,dx,dtheta], controls F, end time T """
+  q  = ssym("[x,theta]")
+  x,theta = q
+  dq = ssym("[dx,dtheta]")
+  dx,dtheta = dq
+  v = vertcat([q,dq])
+  F = SX("F")
+  T = SX("T")
+  tau = SX("tau")
+
+  g = 9.81
+  L, I, m, M, c, C = 1, 1, 1, 1, 0.01, 0.01
+
+  p = SXMatrix([x,0]) + L/2.0*SXMatrix([sin(theta),cos(theta)])
+  vp = mul(jacobian(p,q),dq)
+  E = L/2.0*cos(theta)*g
+  K = 1.0/2*m*dx**2 + I*dtheta**2/2 + 1.0/2*M*mul(vp.T,vp)
+  rhs = Lagrangian(K,-E,q,dq,vertcat([F-c*dx,-C*dtheta])).rhs
+
+  f = SXFunction([tau,v,vertcat([F,T]),[]],[rhs*T])
+  f.init()
+  mayer = SXFunction([v,T],[T])
+  mayer.init()
+  return f, mayer
+
+def solveOCP(ns,options={},logfile="ocp_ipopt.out",dynamics=None):
+  """ Solves the time-optimal OCP on ns intervals; returns the metrics
+
+  dynamics: (f, mayer) of timeOptimalDynamics, built if not given
+  """
+  f, mayer = timeOptimalDynamics() if dynamics is None else dynamics
+  I = CVodesIntegrator(f)
+  I.setOption("reltol",1e-12)
+  I.init()
+
+  nlp_options = {"max_iter": 200}
+  nlp_options.update(options)
+
+  ms = MultipleShooting(I,mayer,FX())
+  ms.setOption("final_time",1)
+  ms.setOption("parallelization","expand")
+  ms.setOption("number_of_grid_points",ns)
+  ms.setOption("number_of_parameters",1)
+  ms.setOption("nlp_solver",IpoptSolver)
+  ms.setOption("nlp_solver_options",ipoptprofile.instrument(nlp_options,logfile))
+  ms.init()
+
+  ms.input(OCP_LBX).setAll(-n.inf)
+  ms.input(OCP_UBX).setAll(n.inf)
+  ms.input(OCP_LBX)[0,:] = -5
+  ms.input(OCP_LBX)[1,:] = -20
+  ms.input(OCP_UBX)[0,:] = 5
+  ms.input(OCP_UBX)[1,:] = 20
+
+  ms.input(OCP_LBX)[:-1,0] = ms.input(OCP_UBX)[:-1,0] = DMatrix([0,0,0])
+  ms.input(OCP_LBX)[:-1,-1] = ms.input(OCP_UBX)[:-1,-1] = DMatrix([-1,0,0])
+
+  ms.input(OCP_X_INIT).setAll(0)
+
+  ms.input(OCP_LBU).setAll(-10)
+  ms.input(OCP_UBU).setAll(10)
+  ms.input(OCP_U_INIT).setAll(0)
+
+  ms.input(OCP_LBP).set([0.1])
+  ms.input(OCP_UBP).set([10])
+
+  t0 = time()
+  ms.solve()
+  wall = time()-t0
+
+  profile = ipoptprofile.parseLog(logfile)
+  b = ipoptprofile.breakdown(profile)
+  return {'iterations': len(profile['iterations']),
+          'wall': wall,
+          'callbacks': b['callbacks'],
+          'linear_solver': b['linear solver'],
+          'T': float(ms.output(OCP_P_OPT))}, profile['exit']
+
+def run(cases=CASES,ns=NS):
+  rows = []
+  logfile = os.path.join(tempfile.mkdtemp(),"ipopt.out")
+  dynamics = timeOptimalDynamics()
+  for case in cases:
+    for ns_ in case.get('ns',ns):
+      print "%s: ns = %d" % (case['name'],ns_)
+      metrics, status = solveOCP(ns_,case['options'],logfile,dynamics)
+      for metric,value in sorted(metrics.items()):
+        rows.append({'case': case['name'], 'ns': ns_, 'metric': metric, 'value': value, 'exit': status})
+  os.remove(logfile)
+  os.rmdir(os.path.dirname(logfile))
+  return {'metadata': benchtools.metadata(), 'results': rows}
+
+def path(ref):
+  return os.path.join(DIRECTORY,ref+".json")
+
+def save(results):
+  if not os.path.isdir(DIRECTORY):
+    os.makedirs(DIRECTORY)
+  filename = path(results['metadata'].get('commit','unknown'))
+  benchtools.save(results,filename)
+  return filename
+
+def load(ref):
+  """ The results of a commit (a prefix suffices) or of a result file """
+  if os.path.exists(ref):
+    return benchtools.load(ref)
+  matches = [e for e in os.listdir(DIRECTORY) if e.startswith(ref)]
+  if len(matches)!=1:
+    raise Exception("No unique results for '%s' in %s" % (ref,DIRECTORY))
+  return benchtools.load(os.path.join(DIRECTORY,matches[0]))
+
+def compare(old,new,threshold=0.1):
+  """ Returns the rows of new that are worse than old by more than threshold (relative)
+
+  Wall and callback times are noisy; iterations and T flag changes of the
+  solution path itself.
+  """
+  return benchtools.compare(old,new,lambda r: (r['case'],r['ns'],r['metric']),threshold)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Time-optimal cart-pendulum benchmarks")
+  sub = parser.add_subparsers(dest='command')
+  p = sub.add_parser('run',help="run the suite and store the results of the current commit")
+  p.add_argument('--ns',type=int,nargs='+',default=NS)
+  p = sub.add_parser('compare',help="flag regressions between the results of two commits")
+  p.add_argument('old')
+  p.add_argument('new')
+  p.add_argument('--threshold',type=float,default=0.1)
+  args = parser.parse_args(argv)
+
+  if args.command=='run':
+    results = run(ns=args.ns)
+    print "results written to %s" % save(results)
+    print "%12s %6s %10s %10s %12s %14s %8s  %s" % ("case","ns","iterations","wall [s]","callbacks [s]","lin.solver [s]","T","exit")
+    table = {}
+    for r in results['results']:
+      table.setdefault((r['case'],r['ns']),{'exit': r['exit']})[r['metric']] = r['value']
+    for c in CASES:
+      for ns_ in args.ns:
+        m = table[(c['name'],ns_)]
+        print "%12s %6d %10d %10.3f %12.3f %14.3f %8.4f  %s" % (c['name'],ns_,m['iterations'],m['wall'],m['callbacks'],m['linear_solver'],m['T'],m['exit'])
+  else:
+    regressions = compare(load(args.old),load(args.new),args.threshold)
+    for r,before in regressions:
+      print "REGRESSION %s ns=%d %s: %g -> %g (%+.0f%%)" % (r['case'],r['ns'],r['metric'],before,r['value'],100*(r['value']/before-1) if before else n.inf)
+    print "%d regressions" % len(regressions)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,112 @@
+""" Concurrent integration of multiple shooting intervals
+
+In a multiple shooting NLP, every iteration integrates each interval from
+its own initial state and parameters, together with the sensitivities of
+the end state. The intervals are independent, but MultipleShooting's
+"parallelization" option only offers "serial" and "expand".
+
+ParallelShooting evaluates the intervals, and the Jacobians of their end
+states with respect to initial state and parameters, in a pool of
+workers:
+
+  "serial"    : in this process
+  "processes" : forked worker processes, which inherit the initialized
+                integrator and Jacobians; only states and results travel
+  "threads"   : a thread pool, each thread with its own clone of the
+                integrator; the SWIG calls into CasADi hold the GIL, so
+                this gives no speedup with the current bindings
+
+Each interval is a single forward solve: the integrator runs with one
+forward direction per entry of [x0;p], so the end state and both
+Jacobians come out of the same integration.
+
+The pool is created once and reused for every evaluation.
+"""
+
+from casadi import *
+import numpy as n
+import multiprocessing
+import multiprocessing.pool
+
+class ParallelShooting:
+  def __init__(self,integrator,parallelization="serial",workers=None):
+    """ integrator: an initialized integrator over one interval """
+    self.nx = integrator.input(INTEGRATOR_X0).size()
+    self.np = integrator.input(INTEGRATOR_P).size()
+    self.functions = [self._functions(integrator)]
+    self.parallelization = parallelization
+    self.workers = multiprocessing.cpu_count() if workers is None else workers
+    self.pool = None
+    if parallelization=="processes":
+      global _shooting
+      _shooting = self
+      self.pool = multiprocessing.Pool(self.workers)
+    elif parallelization=="threads":
+      # CasADi functions are not thread-safe: one copy per thread
+      self.functions+= [self._functions(integrator) for k in range(self.workers-1)]
+      self.pool = multiprocessing.pool.ThreadPool(self.workers)
+    elif parallelization!="serial":
+      raise Exception("Unknown parallelization '%s'" % parallelization)
+
+  def _functions(self,integrator):
+    """ A copy of the integrator seeded with the unit directions of [x0;p] """
+    nz = self.nx+self.np
+    f = integrator.clone()
+    f.setOption("number_of_fwd_dir",nz)
+    f.init()
+    for d in range(nz):
+      e = n.zeros(nz)
+      e[d] = 1
+      f.fwdSeed(INTEGRATOR_X0,d).set(e[:self.nx])
+      f.fwdSeed(INTEGRATOR_P,d).set(e[self.nx:])
+    return f
+
+  def interval(self,x0,p,k=0):
+    """ End state and its Jacobians with respect to x0 and p for one interval, using copy k """
+    f = self.functions[k]
+    f.input(INTEGRATOR_X0).set(x0)
+    f.input(INTEGRATOR_P).set(p)
+    nz = self.nx+self.np
+    f.evaluate(nz,0)
+    J = n.hstack([f.fwdSens(INTEGRATOR_XF,d).toArray() for d in range(nz)])
+    return [f.output(INTEGRATOR_XF).toArray(),J[:,:self.nx],J[:,self.nx:]]
+
+  def _chunk(self,X0,P,k=0):
+    return [self.interval(X0[:,i],P[:,i],k) for i in range(X0.shape[1])]
+
+  def evaluate(self,X0,P):
+    """ Integrates the intervals with initial states X0 (nx x ns) and parameters P (np x ns)
+
+    Returns the end states XF (nx x ns) and the lists of Jacobians
+    dXF_i/dX0_i and dXF_i/dP_i.
+    """
+    X0 = n.array(X0,dtype=float)
+    P = n.array(P,dtype=float)
+    ns = X0.shape[1]
+    if self.pool is None:
+      results = self._chunk(X0,P)
+    else:
+      # One contiguous chunk per worker, so each task carries many intervals
+      bounds = n.linspace(0,ns,self.workers+1).astype(int)
+      tasks = [(X0[:,a:b],P[:,a:b],k) for k,(a,b) in enumerate(zip(bounds[:-1],bounds[1:])) if b>a]
+      if self.parallelization=="processes":
+        chunks = self.pool.map(_shootingChunk,tasks)
+      else:
+        chunks = self.pool.map(lambda task: self._chunk(*task),tasks)
+      results = [r for chunk in chunks for r in chunk]
+    XF = n.hstack([r[0] for r in results])
+    return XF, [r[1] for r in results], [r[2] for r in results]
+
+  def close(self):
+    if self.pool is not None:
+      self.pool.close()
+      self.pool.join()
+      self.pool = None
+
+# The ParallelShooting that forked the worker processes
+_shooting = None
+
+def _shootingChunk(task):
+  # Each process has its own copy of the functions
+  X0, P, k = task
+  return _shooting._chunk(X0,P)
@@ -0,0 +1,41 @@
+from casadi import *
+import numpy as n
+from shooting import ParallelShooting
+from ocpbenchmark import timeOptimalDynamics
+from time import time
+
+# Wall time of one batch of interval integrations with sensitivities, the
+# integrator work of one NLP iteration, versus worker count. No NLP is
+# solved; threads are left out, as the CasADi calls hold the GIL.
+
+# The time-scaled cart-pendulum of cartpendulum.py: states [x,theta,dx,dtheta], parameters [F,T]
+f, mayer = timeOptimalDynamics()
+
+repeat = 3
+
+print "%6s %10s %8s %12s %8s" % ("ns","mode","workers","t_batch [s]","speedup")
+
+for ns in [10,50,200]:
+  I = CVodesIntegrator(f)
+  I.setOption("tf",1.0/ns)
+  I.setOption("reltol",1e-10)
+  I.init()
+
+  X0 = n.zeros((4,ns))
+  X0[1,:] = n.linspace(0,n.pi,ns)
+  P = n.vstack([n.ones(ns),2*n.ones(ns)])
+
+  t_serial = None
+  for mode, workers in [("serial",1),("processes",2),("processes",4),("processes",8)]:
+    shooting = ParallelShooting(I,mode,workers)
+    shooting.evaluate(X0,P) # warm up
+    ts = []
+    for k in range(repeat):
+      t0=time()
+      shooting.evaluate(X0,P)
+      ts.append(time()-t0)
+    shooting.close()
+    t_batch = min(ts)
+    if t_serial is None:
+      t_serial = t_batch
+    print "%6d %10s %8d %12.4f %8.2f" % (ns,mode,workers,t_batch,t_serial/t_batch)
@@ -0,0 +1,87 @@
+""" Simulation of many shooting intervals at once
+
+After a multiple shooting solve, every interval i is simulated from its own
+initial state X0[:,i] with its own control U[:,i]. Building, initializing
+and evaluating a fresh Simulator per interval repeats the setup ns times.
+
+IntervalSimulator keeps one initialized Simulator per interval duration
+(all intervals share it on a uniform grid) and only changes its inputs.
+The same relative time grid serves every interval, which requires the
+ODE to be autonomous; this is checked on its right hand side. With
+processes > 1 the intervals are divided over forked worker processes,
+which inherit the initialized simulators; pool startup only pays off
+for many intervals.
+"""
+
+from casadi import *
+import numpy as n
+import multiprocessing
+
+class IntervalSimulator:
+  def __init__(self,integrator,f,npoints=100):
+    """ integrator: an initialized integrator of the ODE f; npoints: output points per interval """
+    if dependsOn(f.outputSX(),f.inputSX(ODE_T)):
+      raise Exception("IntervalSimulator: the ODE depends on time, so intervals cannot share a time grid")
+    self.integrator = integrator
+    self.npoints = npoints
+    self.simulators = {}
+
+  def simulator(self,duration):
+    """ An initialized Simulator over [0,duration], built once per duration """
+    key = round(duration,12)
+    if key not in self.simulators:
+      sim = Simulator(self.integrator,n.linspace(0,duration,self.npoints))
+      sim.init()
+      self.simulators[key] = sim
+    return self.simulators[key]
+
+  def interval(self,t0,t1,x0,u):
+    """ Simulates one interval; returns the times and the states (npoints x nx) """
+    sim = self.simulator(t1-t0)
+    sim.input(INTEGRATOR_X0).set(x0)
+    sim.input(INTEGRATOR_P).set(u)
+    sim.evaluate()
+    return n.linspace(t0,t1,self.npoints), n.array(sim.output())
+
+  def simulate(self,tgrid,X0,U,processes=1):
+    """ Simulates all intervals [tgrid[i],tgrid[i+1]] from X0[:,i] with control U[:,i]
+
+    Returns the stacked times and states, as the intervals were simulated
+    one after the other.
+    """
+    tgrid = n.array(tgrid,dtype=float).ravel()
+    X0 = n.array(X0,dtype=float)
+    U = n.array(U,dtype=float)
+    ns = len(tgrid)-1
+    # Create the simulators before forking, so the workers inherit them
+    for i in range(ns):
+      self.simulator(tgrid[i+1]-tgrid[i])
+    if processes==1:
+      chunks = [self._chunk(tgrid,X0,U,range(ns))]
+    else:
+      if processes is None:
+        processes = multiprocessing.cpu_count()
+      global _job
+      _job = (self,tgrid,X0,U)
+      pool = multiprocessing.Pool(processes)
+      chunks = pool.map(_simulateChunk,[range(ns)[k::processes] for k in range(processes)])
+      pool.close()
+      pool.join()
+      _job = None
+    t = [None]*ns
+    results = [None]*ns
+    for chunk in chunks:
+      for i,ti,ri in chunk:
+        t[i] = ti
+        results[i] = ri
+    return n.hstack(t), n.vstack(results)
+
+  def _chunk(self,tgrid,X0,U,indices):
+    return [(i,)+self.interval(tgrid[i],tgrid[i+1],X0[:,i],U[:,i]) for i in indices]
+
+# The simulation being divided over the workers; set before they are forked
+_job = None
+
+def _simulateChunk(indices):
+  self, tgrid, X0, U = _job
+  return self._chunk(tgrid,X0,U,indices)
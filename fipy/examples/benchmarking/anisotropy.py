@@ -92,13 +92,15 @@ if __name__ == "__main__":
 
     steps = 10
 
-    bench.start()
+    bench.start('solve')
 
     for i in range(steps):
+        bench.start('step')
         phase.updateOld()
         temperature.updateOld()
         phaseEq.solve(phase, dt=timeStepDuration)
         temperatureEq.solve(temperature, dt=timeStepDuration)
+        bench.stop('step')
 
     bench.stop('solve')
 
@@ -40,20 +40,192 @@
  # ########################################################################
  ##
 
+"""
+Timing (and memory) of the phases of a benchmark script.
+
+Phases are delimited by `start()` and `stop(name)`, or by the equivalent
+`phase(name)` context manager and `timed(name)` decorator. Phases nest:
+a phase started inside another is recorded under the path of the
+enclosing named phases, e.g. a `step` timed inside `solve` is reported
+as `solve/step`. A phase that runs several times (such as a time step)
+collects one sample per run, summarized by count, total, min, median,
+mean and stddev.
+
+Phases are timed with a monotonic clock where one is available (see
+`_monotonicClock()`), and otherwise with the wall clock, which jumps
+when the system time is adjusted. `results()` tells which was used
+(`monotonicClock`).
+
+With `--peakMemory`, every phase also records the peak resident set size
+reached while it ran (`peakRSS`) and its rise above the RSS at its start
+(`peakIncrease`), in kB, without a sampling thread. On Linux the kernel's
+high-water mark `VmHWM` is reset at the start of each phase through
+`/proc/self/clear_refs`; elsewhere the lifetime peak `ru_maxrss` of
+`getrusage` is used, which only tells how much a phase raised the peak.
+With `--tracemalloc=N` (Python 3.4 and later; ignored with a warning
+otherwise), every phase additionally records the `N` sites whose
+allocations still alive at its end grew most.
+
+`report()` returns the traditional tab-separated line of the
+`mesh`, `variables`, `terms`, `solver`, `BCs` and `solve` times (or
+memories), or, with `--json`, all phases and their statistics as JSON.
+"""
+__docformat__ = 'restructuredtext'
+
+import os
+import sys
 import time
 
 from fipy.tools.parser import parse
 
+def _monotonicClock():
+    """
+    A monotonic clock [s], or None if none is available: `time.perf_counter`
+    (Python 3.3 and later), the `monotonic` package, or, on Linux,
+    `clock_gettime(CLOCK_MONOTONIC)` through ctypes
+    """
+    if hasattr(time, 'perf_counter'):
+        return time.perf_counter
+    try:
+        from monotonic import monotonic
+        return monotonic
+    except (ImportError, RuntimeError):
+        pass
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+            
+        library = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = library.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    except (OSError, AttributeError):
+        return None
+        
+    CLOCK_MONOTONIC = 1
+    
+    def monotonic():
+        t = timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.pointer(t)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return t.tv_sec + t.tv_nsec * 1e-9
+        
+    return monotonic
+
+_clock = _monotonicClock()
+_monotonic = _clock is not None
+if not _monotonic:
+    ## the highest resolution wall clock of the platform; not monotonic,
+    ## so a phase that spans a clock adjustment is timed wrongly
+    import timeit
+    _clock = timeit.default_timer
+
+def _status(key):
+    """
+    The value [kB] of `key` in /proc/self/status, or None
+    """
+    try:
+        for line in open('/proc/self/status'):
+            if line.startswith(key + ':'):
+                return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    return None
+
+def _resetPeak():
+    """
+    Reset the kernel's high-water mark of the resident set size (Linux 4.0
+    and later); return whether that succeeded
+    """
+    try:
+        f = open('/proc/self/clear_refs', 'w')
+        f.write('5')
+        f.close()
+        return True
+    except (IOError, OSError):
+        return False
+
+def _maxrss():
+    """
+    The peak resident set size [kB] of the process so far
+    """
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        ## bytes instead of kB
+        maxrss = maxrss / 1024
+    return maxrss
+
+def _statistics(samples):
+    samples = sorted(samples)
+    n = len(samples)
+    mean = sum(samples) / n
+    if n % 2:
+        median = samples[n // 2]
+    else:
+        median = (samples[n // 2 - 1] + samples[n // 2]) / 2.
+    return {
+        'count': n,
+        'total': sum(samples),
+        'min': samples[0],
+        'max': samples[-1],
+        'median': median,
+        'mean': mean,
+        'stddev': (sum([(s - mean)**2 for s in samples]) / n)**0.5
+    }
+
+class _Phase:
+    def __init__(self, bench, name):
+        self.bench = bench
+        self.name = name
+        
+    def __enter__(self):
+        self.bench.start(self.name)
+        return self
+        
+    def __exit__(self, type, value, traceback):
+        self.bench.stop(self.name)
+        return False
+
 class Benchmarker:
     def __init__(self):
         self.measureMemory = parse('--measureMemory', action = 'store_true', default=False)
         self.sampleTime = parse('--sampleTime', action = 'store', type = 'float', default = 1)
+        self.json = parse('--json', action = 'store_true', default=False)
+        self.peakMemory = parse('--peakMemory', action = 'store_true', default=False)
+        self.tracemalloc = parse('--tracemalloc', action = 'store', type = 'int', default = 0)
         
         self.keys = ['mesh', 'variables', 'terms', 'solver', 'BCs', 'solve']
         
-        self.times = {}
-        for key in self.keys:
-            self.times[key] = 0
+        ## samples of every phase, by path, in order of first appearance
+        self.samples = {}
+        self.order = []
+        
+        ## the phases currently running:
+        ## [name or None, start time, peak RSS, RSS at start, tracemalloc snapshot]
+        self.stack = []
+        
+        ## peak RSS, rise of the peak and top allocations of every phase, by path
+        self.peaks = {}
+        self.increases = {}
+        self.allocations = {}
+        
+        if self.peakMemory:
+            self.resettable = _status('VmHWM') is not None and _resetPeak()
+            
+        if self.tracemalloc:
+            try:
+                import tracemalloc
+                tracemalloc.start()
+            except ImportError:
+                import warnings
+                warnings.warn("--tracemalloc needs Python 3.4 or later; no allocation sites will be recorded")
+                self.tracemalloc = 0
 
         if self.measureMemory:
             from fipy.tools.memoryLogger import MemoryLogger
@@ -65,22 +237,146 @@ class Benchmarker:
             for key in self.keys:
                 self.memories[key] = self.memories['baseline']
 
-        self.t0 = time.clock()
-        
+        self.t0 = _clock()
         
-    def start(self):
-        if self.measureMemory:
+    def start(self, name=None):
+        """
+        Start a phase. The name may be given here or only to the matching
+        `stop()`.
+        """
+        if self.measureMemory and len(self.stack) == 0:
+            ## the memory logger only follows the outermost phases
             self.logger.start()
             
-        self.t1 = time.clock()
+        peak = rss = snapshot = None
+        if self.peakMemory:
+            self._foldPeak()
+            rss = self._rss()
+            peak = rss
+        if self.tracemalloc:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            
+        self.stack.append([name, _clock(), peak, rss, snapshot])
 
-    def stop(self, name):
-        self.times[name] = time.clock() - self.t1
-        if self.measureMemory:
-            self.memories[name] = self.logger.stop()
+    def stop(self, name=None):
+        """
+        Stop the innermost running phase and record its duration under `name`
+        (or the name it was started with).
+        """
+        t1 = _clock()
+        if len(self.stack) == 0:
+            raise RuntimeError("Benchmarker.stop('%s') without start()" % name)
+        if self.peakMemory:
+            self._foldPeak()
+        started, t, peak, rss, snapshot = self.stack.pop()
+        if name is None:
+            name = started
+        elif started is not None and started != name:
+            raise RuntimeError("Benchmarker.stop('%s') does not match start('%s')" % (name, started))
+            
+        path = "/".join([s[0] for s in self.stack if s[0] is not None] + [str(name)])
+        if path not in self.samples:
+            self.samples[path] = []
+            self.order.append(path)
+        self.samples[path].append(t1 - t)
+        
+        if self.peakMemory:
+            self.peaks[path] = max(self.peaks.get(path, 0), peak)
+            self.increases[path] = max(self.increases.get(path, 0), peak - rss)
+            
+        if self.tracemalloc:
+            import tracemalloc
+            ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+            stats = tracemalloc.take_snapshot().filter_traces(ignore).compare_to(snapshot.filter_traces(ignore), 'lineno')
+            self.allocations[path] = [str(stat) for stat in stats[:self.tracemalloc]]
+        
+        if self.measureMemory and len(self.stack) == 0:
+            self.memories[path] = self.logger.stop()
+            
+        return t1 - t
+
+    def _rss(self):
+        if self.resettable:
+            return _status('VmRSS')
+        else:
+            return _maxrss()
+            
+    def _foldPeak(self):
+        """
+        Fold the peak RSS since the last call into all running phases
+        """
+        if self.resettable:
+            peak = _status('VmHWM')
+            _resetPeak()
+        else:
+            peak = _maxrss()
+        for phase in self.stack:
+            phase[2] = max(phase[2], peak)
+
+    def phase(self, name):
+        """
+        A context manager timing the enclosed block::
+        
+            with bench.phase('solve'):
+                ...
+        """
+        return _Phase(self, name)
+        
+    def timed(self, name=None):
+        """
+        A decorator timing every call of the decorated function.
+        """
+        def decorator(f):
+            def wrapper(*args, **kwargs):
+                self.start(name or f.__name__)
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.stop(name or f.__name__)
+            wrapper.__name__ = f.__name__
+            wrapper.__doc__ = f.__doc__
+            return wrapper
+        return decorator
+        
+    def time(self, name):
+        """
+        The total time spent in phase `name` (0 if it never ran).
+        """
+        return sum(self.samples.get(name, [0]))
+        
+    def results(self, numberOfElements=1, steps=1):
+        """
+        All phases and their statistics, the total time, and the solve time
+        per step and element, as a dictionary.
+        """
+        total = _clock() - self.t0
+        phases = {}
+        for path in self.order:
+            phases[path] = _statistics(self.samples[path])
+            if self.measureMemory and path in self.memories:
+                phases[path]['memory'] = self.memories[path] - self.memories['baseline']
+            if path in self.peaks:
+                phases[path]['peakRSS'] = self.peaks[path]
+                phases[path]['peakIncrease'] = self.increases[path]
+            if path in self.allocations:
+                phases[path]['allocations'] = self.allocations[path]
+        return {
+            'numberOfElements': numberOfElements,
+            'steps': steps,
+            'order': self.order,
+            'phases': phases,
+            'total': total,
+            'monotonicClock': _monotonic,
+            'solvePerStepPerElement': self.time('solve') / steps / numberOfElements
+        }
             
     def report(self, numberOfElements=1, steps=1):
-        self.times['total'] = time.clock() - self.t0
+        if self.json:
+            import json
+            return json.dumps(self.results(numberOfElements=numberOfElements, steps=steps))
+            
+        total = _clock() - self.t0
 
         output = []
         maxMemory = -1
@@ -90,11 +386,11 @@ class Benchmarker:
                 output += [str(memory)]
                 maxMemory = max(maxMemory, memory)
             else:
-                output += [str(self.times[key])]
+                output += [str(self.time(key))]
                 
         if self.measureMemory:
             output += [str(maxMemory), str(float(maxMemory) / numberOfElements)]
         else:
-            output += [str(self.times['total']), str(self.times['solve'] / steps / numberOfElements)]
+            output += [str(total), str(self.time('solve') / steps / numberOfElements)]
 
-        return "\t".join(output)
\ No newline at end of file
+        return "\t".join(output)
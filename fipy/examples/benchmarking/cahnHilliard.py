@@ -140,14 +140,16 @@ if __name__ == "__main__":
     var.updateOld()
     eqch.solve(var, boundaryConditions = BCs, solver = solver, dt = dt)
 
-    bench.start()
+    bench.start('solve')
 
     for step in range(steps):
+        bench.start('step')
         dt = numerix.exp(dexp)
         dt = min(100, dt)
         dexp += 0.01
         var.updateOld()
         eqch.solve(var, boundaryConditions = BCs, solver = solver, dt = dt)
+        bench.stop('step')
                 
     bench.stop('solve')
 
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+r"""
+A structured 2D grid whose geometry is computed on first access.
+
+`Grid2D` builds vertices, faces, cells and their connectivity up front,
+even though on a structured grid every one of them follows from the
+indices by a closed-form expression. `LazyGrid2D` only stores `nx`, `ny`,
+`dx` and `dy`. Every geometric quantity is computed, vectorized, the first
+time it is asked for, and then cached. Quantities that are the same on
+every cell or face of a uniform grid (cell volumes, face areas) are
+returned as zero-stride arrays, so they take no memory at all.
+
+Numbering follows `Grid2D`:
+
+- cell `(i, j)` has ID `i + j * nx`
+- the `nx * (ny + 1)` horizontal faces come first, face `(i, j)` (at
+  height `j * dy`) has ID `i + j * nx`
+- vertical face `(i, j)` (at `x = i * dx`) has ID
+  `nx * (ny + 1) + i + j * (nx + 1)`
+
+Arrays of points and vectors have shape `(n, 2)`.
+
+This is a prototype, not a drop-in replacement for `Grid2D`: it is not
+a `Mesh` subclass and does not provide FiPy's mesh interface (its
+geometry is not held in `MeshVariable`s), so no `CellVariable` or term
+can be defined on it, and it does not reduce the startup cost of the
+FiPy examples. It only measures what lazy, closed-form geometry would
+save.
+"""
+__docformat__ = 'restructuredtext'
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+def _cached(method):
+    """
+    Compute `method` on first access and keep the result
+    """
+    name = '_' + method.__name__
+    def wrapper(self):
+        if name not in self.__dict__:
+            self.__dict__[name] = method(self)
+        return self.__dict__[name]
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+def _constant(value, n):
+    """
+    An array of `n` times `value` that only stores one element; it is
+    read-only, as writing to any entry would change all of them
+    """
+    a = as_strided(numpy.array([value], dtype=float), shape=(n,), strides=(0,))
+    a.flags.writeable = False
+    return a
+
+class LazyGrid2D:
+    def __init__(self, dx=1., dy=1., nx=1, ny=1):
+        self.dx = float(dx)
+        self.dy = float(dy)
+        self.nx = int(nx)
+        self.ny = int(ny)
+
+        self.numberOfHorizontalFaces = self.nx * (self.ny + 1)
+        self.numberOfVerticalFaces = (self.nx + 1) * self.ny
+
+    def getNumberOfCells(self):
+        return self.nx * self.ny
+
+    def getNumberOfFaces(self):
+        return self.numberOfHorizontalFaces + self.numberOfVerticalFaces
+
+    def getDim(self):
+        return 2
+
+    ## indices
+
+    def _cellIndices(self):
+        """
+        The `(i, j)` indices of all cells
+        """
+        ids = numpy.arange(self.getNumberOfCells())
+        return ids % self.nx, ids // self.nx
+
+    def _horizontalFaceIndices(self):
+        ids = numpy.arange(self.numberOfHorizontalFaces)
+        return ids % self.nx, ids // self.nx
+
+    def _verticalFaceIndices(self):
+        ids = numpy.arange(self.numberOfVerticalFaces)
+        return ids % (self.nx + 1), ids // (self.nx + 1)
+
+    ## boundaries
+
+    def getFacesBottom(self):
+        return numpy.arange(self.nx)
+
+    def getFacesTop(self):
+        return numpy.arange(self.nx) + self.nx * self.ny
+
+    def getFacesLeft(self):
+        return self.numberOfHorizontalFaces + numpy.arange(self.ny) * (self.nx + 1)
+
+    def getFacesRight(self):
+        return self.getFacesLeft() + self.nx
+
+    def getExteriorFaces(self):
+        return numpy.concatenate((self.getFacesBottom(), self.getFacesTop(),
+                                  self.getFacesLeft(), self.getFacesRight()))
+
+    @_cached
+    def getInteriorFaces(self):
+        exterior = numpy.zeros(self.getNumberOfFaces(), dtype=bool)
+        exterior[self.getExteriorFaces()] = True
+        return numpy.nonzero(~exterior)[0]
+
+    ## geometry
+
+    @_cached
+    def getCellCenters(self):
+        i, j = self._cellIndices()
+        return numpy.column_stack(((i + 0.5) * self.dx, (j + 0.5) * self.dy))
+
+    def getCellVolumes(self):
+        return _constant(self.dx * self.dy, self.getNumberOfCells())
+
+    @_cached
+    def getFaceCenters(self):
+        i, j = self._horizontalFaceIndices()
+        horizontal = numpy.column_stack(((i + 0.5) * self.dx, j * self.dy))
+        i, j = self._verticalFaceIndices()
+        vertical = numpy.column_stack((i * self.dx, (j + 0.5) * self.dy))
+        return numpy.concatenate((horizontal, vertical))
+
+    @_cached
+    def getFaceAreas(self):
+        if self.dx == self.dy:
+            return _constant(self.dx, self.getNumberOfFaces())
+        return numpy.concatenate((numpy.repeat(self.dx, self.numberOfHorizontalFaces),
+                                  numpy.repeat(self.dy, self.numberOfVerticalFaces)))
+
+    @_cached
+    def getFaceNormals(self):
+        """
+        Unit normals, pointing out of the domain on the exterior faces
+        """
+        normals = numpy.zeros((self.getNumberOfFaces(), 2))
+        normals[:self.numberOfHorizontalFaces, 1] = 1
+        normals[self.numberOfHorizontalFaces:, 0] = 1
+        normals[self.getFacesBottom(), 1] = -1
+        normals[self.getFacesLeft(), 0] = -1
+        return normals
+
+    ## connectivity
+
+    @_cached
+    def getCellFaceIDs(self):
+        """
+        The bottom, right, top and left face of every cell
+        """
+        i, j = self._cellIndices()
+        bottom = i + j * self.nx
+        left = self.numberOfHorizontalFaces + i + j * (self.nx + 1)
+        return numpy.column_stack((bottom, left + 1, bottom + self.nx, left))
+
+    @_cached
+    def getFaceCellIDs(self):
+        """
+        The two cells of every face; exterior faces only have the first,
+        the second is -1
+        """
+        i, j = self._horizontalFaceIndices()
+        below = i + (j - 1) * self.nx
+        above = i + j * self.nx
+        horizontal = numpy.column_stack((numpy.where(j > 0, below, above),
+                                         numpy.where((j > 0) & (j < self.ny), above, -1)))
+        i, j = self._verticalFaceIndices()
+        left = i - 1 + j * self.nx
+        right = i + j * self.nx
+        vertical = numpy.column_stack((numpy.where(i > 0, left, right),
+                                       numpy.where((i > 0) & (i < self.nx), right, -1)))
+        return numpy.concatenate((horizontal, vertical))
+
+    @_cached
+    def getCellDistances(self):
+        """
+        The distance between the cells of every face; on exterior faces,
+        between the cell and the face
+        """
+        interior = self.getFaceCellIDs()[:, 1] >= 0
+        h = self.numberOfHorizontalFaces
+        distances = numpy.empty(self.getNumberOfFaces())
+        distances[:h] = self.dy
+        distances[h:] = self.dx
+        distances[~interior] *= 0.5
+        return distances
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+r"""
+This example benchmarks the speed and memory usage of a lazily
+materialized structured grid, `LazyGrid2D`, on a uniform grid of
+`--numberOfElements` cells (10**7 by default). Run:
+
+    $ python lazyMesh.py --json --peakMemory [--numberOfElements=10000000] [--grid2D]
+
+Constructing the mesh, and asking for its cell volumes and face areas,
+should not raise the peak memory at all (`peakIncrease` of the `mesh`,
+`volumes` and `areas` phases), independent of the number of cells. Only
+quantities that genuinely differ per cell or face (`centers`, `faces`)
+grow linearly. With `--grid2D`, `Grid2D` is built too, for reference.
+
+`LazyGrid2D` is a prototype that FiPy's variables and terms cannot use
+(see `lazyGrid2D.py`); this benchmark measures the geometry alone.
+"""
+__docformat__ = 'restructuredtext'
+
+if __name__ == "__main__":
+
+    from fipy.tools.parser import parse
+
+    from benchmarker import Benchmarker
+    bench = Benchmarker()
+
+    numberOfElements = parse('--numberOfElements', action = 'store', type = 'int', default = 10**7)
+    grid2D = parse('--grid2D', action = 'store_true', default = False)
+
+    import numpy
+    nx = int(numpy.sqrt(numberOfElements))
+    ny = nx
+    dx = 1.
+    dy = 1.
+
+    from lazyGrid2D import LazyGrid2D
+
+    bench.start('mesh')
+    mesh = LazyGrid2D(nx = nx, ny = ny, dx = dx, dy = dy)
+    bench.stop('mesh')
+
+    bench.start('volumes')
+    mesh.getCellVolumes().sum()
+    bench.stop('volumes')
+
+    bench.start('areas')
+    mesh.getFaceAreas()[mesh.getExteriorFaces()].sum()
+    bench.stop('areas')
+
+    bench.start('centers')
+    mesh.getCellCenters()
+    bench.stop('centers')
+
+    bench.start('faces')
+    mesh.getFacesTop()
+    mesh.getCellFaceIDs()
+    bench.stop('faces')
+
+    if grid2D:
+        bench.start('Grid2D')
+        from fipy.meshes.grid2D import Grid2D
+        reference = Grid2D(nx = nx, ny = ny, dx = dx, dy = dy)
+        reference.getCellCenters()
+        reference.getFacesTop()
+        bench.stop('Grid2D')
+
+    print bench.report(numberOfElements=nx * ny)
@@ -169,7 +169,7 @@ if __name__ == "__main__":
     thetaEq.solve(theta, dt = timeStepDuration)
     phaseEq.solve(phase, dt = timeStepDuration)
 
-    bench.start()
+    bench.start('solve')
 
     ##from profiler import Profiler
     ##from profiler import calibrate_profiler
@@ -177,10 +177,12 @@ if __name__ == "__main__":
     ##profile = Profiler('profile-HEAD-i686', fudge=fudge)
 
     for i in range(steps):
+        bench.start('step')
         theta.updateOld()
         phase.updateOld()
         thetaEq.solve(theta, dt = timeStepDuration)
         phaseEq.solve(phase, dt = timeStepDuration)
+        bench.stop('step')
 
     ##profile.stop()
 
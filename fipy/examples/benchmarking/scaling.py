@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+r"""
+Scaling sweep over the benchmarking examples. Run:
+
+    $ python scaling.py [--benchmarks=mesh,cahnHilliard] [--minElements=100]
+          [--maxElements=100000] [--points=6] [--output=scaling]
+
+Every benchmark is run once per number of elements, on a geometric range
+from `--minElements` to `--maxElements`, each in its own Python process
+(with `--json --peakMemory`), so no run inherits the memory or the
+caches of another. For every phase, the exponent `p` of
+
+    time ~ numberOfElements**p
+
+(and likewise of the rise of the peak RSS during the phase,
+`peakIncrease`) is fitted by least squares in log-log
+space. Phases with `p` above `--threshold` (1.2 by default) are flagged
+as not scaling linearly.
+
+The raw runs and the fits are written to `<output>/scaling.json`, a table
+to `<output>/report.txt` and, if matplotlib is available, one log-log
+plot per benchmark to `<output>/<benchmark>.png`.
+"""
+__docformat__ = 'restructuredtext'
+
+import os
+import sys
+import json
+import subprocess
+
+import numpy
+
+BENCHMARKS = ['mesh', 'superfill', 'cahnHilliard', 'anisotropy', 'phaseImpingement', 'transientPulse']
+
+def sizes(minElements, maxElements, points):
+    """
+    Geometrically spaced, distinct numbers of elements
+    """
+    n = numpy.logspace(numpy.log10(minElements), numpy.log10(maxElements), points)
+    return sorted(set([int(round(x)) for x in n]))
+
+def runBenchmark(name, numberOfElements, directory=None, timeout=None):
+    """
+    Run one benchmark in a fresh interpreter and return its JSON results,
+    or a dictionary with the `error`
+    """
+    if directory is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(directory, name + '.py'),
+               '--numberOfElements=%d' % numberOfElements, '--json', '--peakMemory']
+    if timeout is not None:
+        command = ['timeout', str(timeout)] + command
+    process = subprocess.Popen(command, cwd=directory,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    if process.returncode != 0:
+        return {'error': err.decode('utf-8', 'replace').strip().split('\n')[-1],
+                'returncode': process.returncode}
+    ## the report is the last line printed
+    for line in reversed(out.decode('utf-8', 'replace').strip().split('\n')):
+        try:
+            return json.loads(line)
+        except ValueError:
+            pass
+    return {'error': 'no benchmark report in the output'}
+
+def fitExponent(n, values):
+    """
+    The least squares exponent p of values ~ n**p (None if fewer than two
+    positive values)
+    """
+    n = numpy.array(n, dtype=float)
+    values = numpy.array(values, dtype=float)
+    positive = values > 0
+    if positive.sum() < 2:
+        return None
+    return float(numpy.polyfit(numpy.log(n[positive]), numpy.log(values[positive]), 1)[0])
+
+def series(runs, phase, metric='total'):
+    """
+    The numbers of elements and values of one metric of one phase over the
+    successful runs
+    """
+    n = []
+    values = []
+    for run in runs:
+        if 'error' in run:
+            continue
+        if phase == 'total' and metric == 'total':
+            value = run['total']
+        elif phase == 'total':
+            ## the largest value of any phase
+            value = max([0] + [p[metric] for p in run['phases'].values() if metric in p])
+        elif phase in run['phases'] and metric in run['phases'][phase]:
+            value = run['phases'][phase][metric]
+        else:
+            continue
+        n.append(run['numberOfElements'])
+        values.append(value)
+    return n, values
+
+def phases(runs):
+    names = []
+    for run in runs:
+        for name in run.get('order', []):
+            if name not in names:
+                names.append(name)
+    return names + ['total']
+
+def fit(runs):
+    """
+    The time and memory exponents of every phase
+    """
+    exponents = {}
+    for phase in phases(runs):
+        exponents[phase] = {'time': fitExponent(*series(runs, phase, 'total')),
+                            'memory': fitExponent(*series(runs, phase, 'peakIncrease'))}
+    return exponents
+
+def report(results, threshold=1.2):
+    lines = []
+    for name in results['benchmarks']:
+        runs = results['runs'][name]
+        lines.append("%s" % name)
+        for run in runs:
+            if 'error' in run:
+                lines.append("  numberOfElements = %d failed: %s" % (run['numberOfElements'], run['error']))
+        lines.append("  %-24s %10s %10s" % ("phase", "p(time)", "p(memory)"))
+        for phase in phases(runs):
+            e = results['exponents'][name][phase]
+            flag = ""
+            if e['time'] is not None and e['time'] > threshold:
+                flag = "  <- superlinear"
+            format = lambda p: "%10s" % "-" if p is None else "%10.2f" % p
+            lines.append("  %-24s %s %s%s" % (phase, format(e['time']), format(e['memory']), flag))
+        lines.append("")
+    return "\n".join(lines)
+
+def plot(name, runs, filename):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import pylab
+    except ImportError:
+        return False
+    pylab.figure()
+    for phase in phases(runs):
+        n, values = series(runs, phase, 'total')
+        if len(n) > 0:
+            pylab.loglog(n, values, 'o-', label=phase)
+    n = [run['numberOfElements'] for run in runs if 'error' not in run]
+    if len(n) > 0:
+        ## slope one, through the smallest total time
+        n0, t0 = series(runs, 'total')
+        if len(t0) > 0:
+            pylab.loglog(n, [t0[0] * x / n0[0] for x in n], 'k--', label='linear')
+    pylab.xlabel('numberOfElements')
+    pylab.ylabel('time [s]')
+    pylab.title(name)
+    pylab.legend(loc='upper left')
+    pylab.savefig(filename)
+    pylab.close()
+    return True
+
+if __name__ == "__main__":
+    from fipy.tools.parser import parse
+
+    benchmarks = parse('--benchmarks', action = 'store', type = 'string', default = ",".join(BENCHMARKS)).split(',')
+    minElements = parse('--minElements', action = 'store', type = 'int', default = 100)
+    maxElements = parse('--maxElements', action = 'store', type = 'int', default = 100000)
+    points = parse('--points', action = 'store', type = 'int', default = 6)
+    threshold = parse('--threshold', action = 'store', type = 'float', default = 1.2)
+    timeout = parse('--timeout', action = 'store', type = 'int', default = 3600)
+    output = parse('--output', action = 'store', type = 'string', default = 'scaling')
+
+    if not os.path.isdir(output):
+        os.makedirs(output)
+
+    results = {'benchmarks': benchmarks, 'sizes': sizes(minElements, maxElements, points),
+               'runs': {}, 'exponents': {}}
+    for name in benchmarks:
+        runs = []
+        for numberOfElements in results['sizes']:
+            print "%s: numberOfElements = %d" % (name, numberOfElements)
+            run = runBenchmark(name, numberOfElements, timeout=timeout)
+            run['numberOfElements'] = numberOfElements
+            runs.append(run)
+        results['runs'][name] = runs
+        results['exponents'][name] = fit(runs)
+        plot(name, runs, os.path.join(output, name + '.png'))
+
+    json.dump(results, open(os.path.join(output, 'scaling.json'), 'w'), indent=1)
+    text = report(results, threshold=threshold)
+    open(os.path.join(output, 'report.txt'), 'w').write(text)
+    print text
@@ -258,9 +258,10 @@ if __name__ == "__main__":
     bulkCatalystEquation.solve(bulkCatalystVar, dt = dt,
                                boundaryConditions = catalystBCs)
 
-    bench.start()
+    bench.start('solve')
       
     for step in range(numberOfSteps):
+        bench.start('step')
 
         if step % levelSetUpdateFrequency == 0:
             distanceVar.calcDistanceFunction()
@@ -279,6 +280,7 @@ if __name__ == "__main__":
                             boundaryConditions = metalEquationBCs)
         bulkCatalystEquation.solve(bulkCatalystVar, dt = dt,
                                       boundaryConditions = catalystBCs)
+        bench.stop('step')
 
     bench.stop('solve')
 
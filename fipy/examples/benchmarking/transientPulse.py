@@ -2,15 +2,18 @@
 
 if __name__ == "__main__":
     
+    from fipy.tools.parser import parse
+
     from benchmarker import Benchmarker
     bench = Benchmarker()
 
+    N = parse('--numberOfElements', action = 'store', type = 'int', default = 100000)
+
     bench.start()
 
     ## from fipy.meshes.numMesh.grid1D import Grid1D
     from fipy.meshes.numMesh.uniformGrid1D import UniformGrid1D as Grid1D
 
-    N = 100000
     L = 10.
     dx = L / N
     mesh = Grid1D(nx = N, dx = dx)
@@ -40,12 +43,14 @@ if __name__ == "__main__":
     ## viewer.plot()
     ## raw_input("initial")
 
-    bench.start()
+    bench.start('solve')
 
     dt = 1e0
     steps = 1
     for step in range(steps):
+        bench.start('step')
         eq.solve(var = C, dt = dt)
+        bench.stop('step')
     ##     viewer.plot()
 
     bench.stop('solve')